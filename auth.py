@@ -1,12 +1,19 @@
-from fastapi import HTTPException, Depends, APIRouter, Form, status
+from fastapi import HTTPException, Depends, APIRouter, Form, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from database import db_dependency
+from database import async_db_dependency
+from executor import run_password_hash
 from model import User, Token
+from queries import fetch_one
+from rate_limit import account_limiter, ip_limiter
+from ttl_cache import TTLCache
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Annotated
-from sqlalchemy import select
+from sqlalchemy import select, update
+import math
+import os
+import time
 
 router = APIRouter(
     prefix='/auth',
@@ -18,23 +25,68 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 45
 SECRET_KEY = "cornelialtboro"
 ALGORITHM = "HS256"
 
-# Hashing passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashing passwords. Hashes made with any other cost are upgraded transparently on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 # Token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-# Function to verify password
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-    
+# Caches for verified token claims and slim user contexts (per worker process)
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+token_cache = TTLCache(AUTH_CACHE_SIZE, TOKEN_CACHE_TTL)
+user_cache = TTLCache(AUTH_CACHE_SIZE, USER_CACHE_TTL)
+
+# Columns that make up the user context handed to endpoints
+USER_CONTEXT_COLUMNS = (User.id, User.username, User.email, User.full_name, User.profile_picture_url)
+
+# Function to hash password (on the bounded password pool, off the event loop)
+async def hash_password(password: str) -> str:
+    return await run_password_hash(pwd_context.hash, password)
+
+# Function to verify password; returns (valid, new_hash) where new_hash is set when the stored hash needs upgrading
+async def verify_password(plain_password, hashed_password):
+    return await run_password_hash(pwd_context.verify_and_update, plain_password, hashed_password)
+
 # Function to authenticate user
-def authenticate_user(email: str, password: str, db):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password_hash):
+async def authenticate_user(email: str, password: str, db):
+    result = await db.execute(select(User.id, User.username, User.email, User.password_hash).filter(User.email == email))
+    user = result.first()
+    # Return the connection to the pool before waiting for bcrypt; a rehash checks out a new one
+    await db.rollback()
+    if not user:
+        return False
+    valid, new_hash = await verify_password(password, user.password_hash)
+    if not valid:
         return False
+    if new_hash:
+        await db.execute(update(User.__table__).where(User.id == user.id).values(password_hash=new_hash))
+        await db.commit()
     return user
 
+# Function to read the client IP; request.client already honours X-Forwarded-For from proxies
+# trusted by uvicorn (--forwarded-allow-ips / FORWARDED_ALLOW_IPS)
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else 'unknown'
+
+# Function to enforce login rate limits before spending CPU on bcrypt; a successful login takes its attempts back
+def check_login_rate(email: str, client_ip: str):
+    retry_after = max(ip_limiter.hit(f"ip:{client_ip}"), account_limiter.hit(f"account:{email.lower()}"))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Too many login attempts, try again later.',
+            headers={'Retry-After': str(math.ceil(retry_after))}
+        )
+
 # Function to create access token
 def create_access_token(email: str, id: int, expires_delta: timedelta):
     encode = {'sub': email, 'id': id}
@@ -44,41 +96,71 @@ def create_access_token(email: str, id: int, expires_delta: timedelta):
     return encoded_jwt
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get('sub')
         id: int = payload.get('id')
         if email is None or id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='cloud not validate user.')
-        return {'email': email, 'id': id}
+        claims = {'email': email, 'id': id}
+        # Never cache a token past its own expiry
+        token_cache.set(token, claims, ttl_seconds=payload['exp'] - time.time() if 'exp' in payload else None)
+        return claims
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='cloud not validate user.')
 
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+# Function to resolve the authenticated user's profile, cached by user id
+async def get_current_user_context(claims: user_dependency, db: async_db_dependency):
+    context = user_cache.get(claims['id'])
+    if context is None:
+        context = await fetch_one(db, select(*USER_CONTEXT_COLUMNS).where(User.id == claims['id']))
+        if context is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='cloud not validate user.')
+        user_cache.set(claims['id'], context)
+    return context
+
+user_context_dependency = Annotated[dict, Depends(get_current_user_context)]
+
+# Function to drop cached auth state after a user's profile changes
+def invalidate_user(user_id: int):
+    user_cache.pop(user_id)
+    token_cache.discard_where(lambda claims: claims['id'] == user_id)
+
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def create_user(db: db_dependency, username: str = Form(...), email: str = Form(...), password: str = Form(...)):
+async def create_user(db: async_db_dependency, username: str = Form(...), email: str = Form(...), password: str = Form(...)):
     # Check if username is already taken
-    existing_username = db.execute(select(User).filter(User.username == username))
+    existing_username = await db.execute(select(User.id).filter(User.username == username))
     if existing_username.scalar():
         raise HTTPException(status_code=400, detail="Username already registered")
 
     # Check if email is already taken
-    existing_email = db.execute(select(User).filter(User.email == email))
+    existing_email = await db.execute(select(User.id).filter(User.email == email))
     if existing_email.scalar():
         raise HTTPException(status_code=400, detail="Email already registered")
     
     create_user = User(
         username = username,
         email = email,
-        password_hash = pwd_context.hash(password)
+        password_hash = await hash_password(password)
     )
     db.add(create_user)
-    db.commit()
+    await db.commit()
     return {"message": "User created successfully"}
 
 @router.post("/login", response_model=Token)
-async def login_for_acces_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
-    user = authenticate_user(form_data.username, form_data.password, db)
+async def login_for_acces_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: async_db_dependency, request: Request):
+    ip = client_ip(request)
+    check_login_rate(form_data.username, ip)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='cloud not validate user.')
+    # Only failed attempts count, so users sharing an IP (NAT, proxies) and frequent re-logins are never locked out
+    account_limiter.reset(f"account:{form_data.username.lower()}")
+    ip_limiter.release(f"ip:{ip}")
     token = create_access_token(user.email, user.id, timedelta(minutes=60))
     return {'userId': user.id, 'username': user.username, 'access_token': token, 'token_type': 'Bearer'}
\ No newline at end of file
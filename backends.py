@@ -0,0 +1,114 @@
+import os
+import threading
+import numpy as np
+
+# Inference backend configuration
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")  # "keras", "tflite" or "onnx"
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 1)))
+INPUT_SHAPE = (128, 128, 3)
+
+MODEL_PATHS = {
+    "keras": "updated_plant_disease_model.keras",
+    "tflite": "updated_plant_disease_model.tflite",
+    "onnx": "updated_plant_disease_model.onnx",
+}
+
+
+class InferenceBackend:
+    """Common interface: predict a (N, 128, 128, 3) float32 batch into (N, classes) scores."""
+
+    name = None
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warm_up(self, batch_sizes=(1,)):
+        """Run dummy batches so graph tracing and buffer allocation happen before real traffic."""
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size, *INPUT_SHAPE), dtype=np.float32))
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')  # Menghilangkan INFO dan WARNING
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=INFERENCE_THREADS)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        # The interpreter holds mutable tensor buffers and is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        input_index = self.input_detail["index"]
+        with self._lock:
+            if tuple(self.interpreter.get_input_details()[0]["shape"]) != batch.shape:
+                self.interpreter.resize_tensor_input(input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+            scale, zero_point = self.input_detail["quantization"]
+            if scale:
+                # int8-quantized model: map float input onto the quantized range
+                batch = np.round(batch / scale + zero_point).astype(self.input_detail["dtype"])
+            self.interpreter.set_tensor(input_index, batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail["index"]).copy()
+        scale, zero_point = self.output_detail["quantization"]
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is required for INFERENCE_BACKEND=onnx")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = INFERENCE_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+# Fungsi memuat backend inferensi
+def load_backend(name: str = INFERENCE_BACKEND, path: str = None) -> InferenceBackend:
+    """Load the named backend from `path` (or its default model file)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](path or MODEL_PATHS[name])
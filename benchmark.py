@@ -0,0 +1,853 @@
+"""Offline benchmarks for the Plantix backend.
+
+Usage:
+    python benchmark.py loop-lag [--requests 64] [--inline]
+    python benchmark.py startup [--repeat 5]
+    python benchmark.py readers [--rows 20000] [--repeat 5]
+    python benchmark.py db-concurrency [--clients 50] [--requests 2000]
+    python benchmark.py auth [--requests 2000]
+    python benchmark.py static [--requests 64] [--repeat 5]
+    python benchmark.py micro [--repeat 50] [--backend keras]
+    python benchmark.py e2e [--clients 8] [--requests 200]
+    python benchmark.py tta [--requests 64] [--backend keras --dataset DIR]
+    python benchmark.py reload [--clients 8] [--requests 200] [--repeat 5] [--backend keras]
+    python benchmark.py explain [--rows 20000]
+    python benchmark.py suite [--output report.json]
+
+`suite` runs every scenario in its own interpreter and writes one JSON report
+(with the git commit, and per-scenario peak RSS) that can be diffed between commits.
+
+Scenarios that need a database use DATABASE_URL when it is set (e.g. a local
+Postgres) and otherwise a seeded SQLite file (requires aiosqlite).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from PIL import Image
+
+
+# Fungsi menghitung persentil latensi (dalam milidetik)
+def summarize(samples):
+    """Return count and p50/p95/p99/max in milliseconds for a list of seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+# Stub model: burns CPU inside numpy (releases the GIL, like TensorFlow does)
+def stub_predict(batch, classes=5, work=256):
+    weights = np.random.default_rng(0).random((work, work), dtype=np.float32)
+    for _ in range(len(batch)):
+        weights = weights @ weights
+        weights /= np.abs(weights).max()
+    logits = np.resize(batch.reshape(len(batch), -1)[:, :classes], (len(batch), classes))
+    return np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+
+
+STUB_CLASSES = ["Bacteria", "Fungus", "Healthy", "Pests", "Virus"]
+
+
+class StubBackend:
+    """stub_predict behind the InferenceBackend interface, for running the app without a model."""
+
+    path = "stub"
+
+    def predict(self, batch):
+        return stub_predict(batch)
+
+    def warm_up(self, batch_sizes=(1,)):
+        pass
+
+
+def stub_label_encoder():
+    from sklearn.preprocessing import LabelEncoder
+    return LabelEncoder().fit(STUB_CLASSES)
+
+
+def stub_preprocess(seed, size=1024, target_size=(128, 128)):
+    image = Image.fromarray(np.random.default_rng(seed).integers(0, 255, (size, size, 3), dtype=np.uint8))
+    return np.expand_dims(np.asarray(image.resize(target_size), dtype=np.float32) / 255.0, axis=0)
+
+
+async def probe_loop_lag(stop, interval=0.01):
+    """Measure how late a periodic tick fires; this is the delay any other route would see."""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+    return lags
+
+
+async def bench_loop_lag(args):
+    from executor import run_preprocess
+    from inference import BatchInferenceEngine
+
+    engine = BatchInferenceEngine(stub_predict)
+
+    async def predict(seed):
+        start = time.perf_counter()
+        if args.inline:
+            # Old behaviour: everything runs on the event loop
+            processed = stub_preprocess(seed)
+            stub_predict(processed)
+            await asyncio.sleep(0)
+        else:
+            processed = await run_preprocess(stub_preprocess, seed)
+            await engine.predict(processed)
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*[predict(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await probe
+    await engine.stop()
+    return {
+        "mode": "inline" if args.inline else "offloaded",
+        "throughput_rps": args.requests / elapsed,
+        "predict_latency": summarize(latencies),
+        "other_route_lag": summarize(lags),
+    }
+
+
+STARTUP_PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.detection.model_registry.load()
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "model_ready_s": ready - start,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+async def bench_startup(args):
+    """Time `import main` (when the worker can serve) and model readiness in fresh interpreters."""
+    # Importing only needs a DATABASE_URL; the probe never queries it
+    use_benchmark_database(0)
+    runs = []
+    for _ in range(args.repeat):
+        env = {**os.environ, "MODEL_PRELOAD": "lazy"}
+        result = subprocess.run([sys.executable, "-c", STARTUP_PROBE], capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            raise RuntimeError(f"startup probe failed: {result.stderr.strip().splitlines()[-1:]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        "runs": len(runs),
+        "import": summarize([run["import_s"] for run in runs]),
+        "model_ready": summarize([run["model_ready_s"] for run in runs]),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+
+
+# Fungsi membuat database SQLite berisi data contoh
+def seed_database(rows, path=":memory:"):
+    """Create the ORM schema in SQLite and insert `rows` detections with realistic text sizes."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+    from model import Base, Feedback, Plant, User, UserDetection
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    started = datetime(2024, 1, 1)
+    text_blob = "Daun menguning di sisi daun;Terdapat bercak atau berwarna gelap. " * 4
+    with Session(engine) as db:
+        db.execute(insert(User.__table__), [{"id": i, "username": f"user{i}", "email": f"user{i}@plantix.id", "password_hash": "x"} for i in range(1, 101)])
+        db.execute(insert(Plant.__table__), [{"id": i, "user_id": i % 100 + 1, "nama": f"plant{i}"} for i in range(1, 1001)])
+        if rows:
+            db.execute(insert(UserDetection.__table__), [{
+                "user_id": i % 100 + 1, "plant_id": i % 1000 + 1, "image_url": f"http://localhost/uploads/detections/{i}.jpg",
+                "category": "Fungus", "symptoms": text_blob, "cause": text_blob, "treatment": text_blob, "confidence_score": 0.9,
+                "detection_date": started - timedelta(minutes=rows - i),
+            } for i in range(rows)])
+            db.execute(insert(Feedback.__table__), [{
+                "user_id": i % 100 + 1, "detection_id": i + 1, "rating": i % 5 + 1, "comments": "Deteksi sesuai",
+            } for i in range(0, rows, 4)])
+        db.commit()
+    return engine
+
+
+def measure(fn, repeat):
+    """Return latency samples and the peak traced allocation (MB) of calling `fn`."""
+    samples = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return {"latency": summarize(samples), "peak_mb": peak}
+
+
+async def measure_async(fn, repeat):
+    """measure() for a coroutine function: each sample awaits `fn()` to completion."""
+    samples = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return {"latency": summarize(samples), "peak_mb": peak}
+
+
+async def bench_readers(args):
+    """Compare pandas.read_sql + to_dict with the queries.py row path and JSON streaming."""
+    import tempfile
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import Session
+    from model import UserDetection
+    from queries import _encode_rows, fetch_all
+
+    # A file, so the sync (pandas) and async (aiosqlite) engines read the same data
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-readers-"), "readers.db")
+    engine = seed_database(args.rows, path)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    query = select(UserDetection.__table__)
+    report = {"rows": args.rows}
+    with Session(engine) as db:
+        try:
+            import pandas as pd
+            report["pandas"] = measure(lambda: pd.read_sql(query, db.connection()).to_dict("records"), args.repeat)
+        except ImportError:
+            report["pandas"] = "pandas not installed"
+
+    async def stream():
+        size = 0
+        async for chunk in _encode_rows(db, query, None, "", 200):
+            size += len(chunk)
+        return size
+
+    async with AsyncSession(async_engine) as db:
+        report["fetch_all"] = await measure_async(lambda: fetch_all(db, query), args.repeat)
+        report["stream_json"] = await measure_async(stream, args.repeat)
+    await async_engine.dispose()
+    engine.dispose()
+    shutil.rmtree(os.path.dirname(path))
+    return report
+
+
+# Fungsi menyiapkan DATABASE_URL untuk skenario yang memakai aplikasi
+def use_benchmark_database(rows):
+    """Point the app at DATABASE_URL, or at a freshly seeded SQLite file when it is unset."""
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.abspath("bench.db")
+        if os.path.exists(path):
+            os.remove(path)
+        seed_database(rows, path).dispose()
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("MODEL_PRELOAD", "lazy")
+
+
+async def run_clients(app, clients, requests, make_request):
+    """Drive `app` with `clients` concurrent HTTP clients; return (latencies, elapsed, errors)."""
+    import httpx
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for i in remaining:
+                start = time.perf_counter()
+                response = await make_request(client, i)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code >= 500
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(clients)])
+    return latencies, time.perf_counter() - started, errors
+
+
+async def bench_db_concurrency(args):
+    """Requests/second for the same indexed read through a sync session vs the async session.
+
+    With more clients than pooled connections the sync variant can stall: a handler blocks the
+    loop waiting for a connection that only a (loop-driven) request teardown can release. A short
+    pool timeout turns that into counted errors instead of a hang.
+    """
+    os.environ.setdefault("DB_POOL_TIMEOUT", "1")
+    use_benchmark_database(args.rows)
+    from fastapi import FastAPI
+    from sqlalchemy import select
+    from database import async_db_dependency, db_dependency
+    from model import UserDetection
+
+    app = FastAPI()
+    query = lambda plant_id: select(UserDetection.id, UserDetection.category).where(UserDetection.plant_id == plant_id).limit(50)
+
+    @app.get("/sync/{plantId}")
+    async def sync_read(plantId: int, db: db_dependency):
+        # The old pattern: a blocking session call inside an async handler
+        return [dict(row) for row in db.execute(query(plantId)).mappings()]
+
+    @app.get("/async/{plantId}")
+    async def async_read(plantId: int, db: async_db_dependency):
+        return [dict(row) for row in (await db.execute(query(plantId))).mappings()]
+
+    report = {"clients": args.clients, "requests": args.requests, "database": os.environ["DATABASE_URL"].split("://")[0]}
+    for mode in ("sync", "async"):
+        latencies, elapsed, errors = await run_clients(
+            app, args.clients, args.requests, lambda client, i: client.get(f"/{mode}/{i % 1000 + 1}"))
+        # Timeouts in the sync variant are the stall being measured; only the async variant must be clean
+        report[mode] = {"throughput_rps": args.requests / elapsed, "errors" if mode == "async" else "stalled": errors, "latency": summarize(latencies)}
+    return report
+
+
+async def bench_auth(args):
+    """Per-request auth overhead: JWT decode and user lookup, uncached vs cached."""
+    use_benchmark_database(args.rows)
+    from datetime import timedelta
+    import auth
+    from database import AsyncSessionLocal
+
+    token = auth.create_access_token("user1@plantix.id", 1, timedelta(minutes=60))
+
+    async def timed(fn, clear):
+        samples = []
+        for _ in range(args.requests):
+            if clear:
+                auth.token_cache.clear()
+                auth.user_cache.clear()
+            start = time.perf_counter()
+            await fn()
+            samples.append(time.perf_counter() - start)
+        return summarize(samples)
+
+    async def resolve_context():
+        async with AsyncSessionLocal() as db:
+            await auth.get_current_user_context(await auth.get_current_user(token), db)
+
+    return {
+        "requests": args.requests,
+        "claims_uncached": await timed(lambda: auth.get_current_user(token), clear=True),
+        "claims_cached": await timed(lambda: auth.get_current_user(token), clear=False),
+        "context_uncached": await timed(resolve_context, clear=True),
+        "context_cached": await timed(resolve_context, clear=False),
+    }
+
+
+async def bench_static(args):
+    """Bytes, requests and latency for a repeat view of `--requests` uploaded images.
+
+    "before" is the plain StaticFiles mount, fetched again on every view the way the app
+    does today; "before_revalidate" is the best a client could do with its ETag alone;
+    "after" is CachedStaticFiles behind a client that honours Cache-Control.
+    """
+    import tempfile
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from static import CachedStaticFiles
+
+    root = tempfile.mkdtemp(prefix="bench-static-")
+    keys = []
+    for i in range(args.requests):
+        image = Image.fromarray(np.random.default_rng(i).integers(0, 255, (1024, 1024, 3), dtype=np.uint8))
+        path = os.path.join(root, "detections", f"{i:064x}.jpg")  # Content-addressed style name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path, quality=90)
+        keys.append(f"detections/{i:064x}.jpg")
+
+    async def view(client, cache, revalidate):
+        """Load every image once through a minimal HTTP cache; return (bytes, requests, seconds)."""
+        received = requests = 0
+        start = time.perf_counter()
+        for key in keys:
+            entry = cache.get(key)
+            if entry is not None and "immutable" in entry.get("cache-control", ""):
+                continue  # Fresh in the client cache: no network at all
+            headers = {"if-none-match": entry["etag"]} if entry is not None and revalidate else {}
+            response = await client.get(f"/uploads/{key}", headers=headers)
+            requests += 1
+            received += len(response.content)
+            if response.status_code == 200:
+                cache[key] = response.headers
+        return received, requests, time.perf_counter() - start
+
+    report = {"images": len(keys), "repeat": args.repeat}
+    for mode, files, revalidate in (("before", StaticFiles, False), ("before_revalidate", StaticFiles, True), ("after", CachedStaticFiles, True)):
+        app = FastAPI()
+        app.mount("/uploads", files(directory=root), name="uploads")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            cache = {}
+            first_bytes, first_requests, first_seconds = await view(client, cache, revalidate)
+            repeat = [await view(client, cache, revalidate) for _ in range(args.repeat)]
+        report[mode] = {
+            "first_view": {"bytes": first_bytes, "requests": first_requests, "ms": first_seconds * 1000},
+            "repeat_view": {
+                "bytes": repeat[-1][0],
+                "requests": repeat[-1][1],
+                "latency": summarize([seconds for _, _, seconds in repeat]),
+            },
+        }
+    shutil.rmtree(root)
+    return report
+
+
+async def bench_micro(args):
+    """Microbenchmarks: decode + preprocess, one forward pass per batch size, label decoding."""
+    import tempfile
+    from ingest import load_image_tensor, preprocess_image
+    from model_registry import LABEL_ENCODER_PATH
+
+    # A 12 MP phone photo, decoded in memory and as a JPEG on disk
+    photo = Image.fromarray(np.random.default_rng(0).integers(0, 255, (3000, 4000, 3), dtype=np.uint8))
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        photo.save(f, quality=90)
+    report = {"repeat": args.repeat}
+    report["preprocess_image"] = measure(lambda: preprocess_image(photo, (128, 128)), args.repeat)
+    report["load_image_tensor"] = measure(lambda: load_image_tensor(f.name, (128, 128)), args.repeat)
+    os.remove(f.name)
+
+    if args.backend:
+        from backends import MODEL_PATHS, load_backend
+        backend = load_backend(args.backend, MODEL_PATHS[args.backend])
+    else:
+        backend = StubBackend()
+    backend.warm_up(batch_sizes=[1])
+    report["backend"] = args.backend or "stub"
+    report["inference"] = {}
+    for batch_size in (1, 4, 8, 16, 32):
+        batch = np.random.default_rng(batch_size).random((batch_size, 128, 128, 3), dtype=np.float32)
+        result = measure(lambda: backend.predict(batch), args.repeat)
+        result["images_per_s"] = batch_size * 1000 / result["latency"]["mean_ms"]
+        report["inference"][batch_size] = result
+
+    try:
+        import joblib
+        label_encoder, report["label_encoder"] = joblib.load(LABEL_ENCODER_PATH), LABEL_ENCODER_PATH
+    except (ImportError, FileNotFoundError):
+        label_encoder, report["label_encoder"] = stub_label_encoder(), "stub"
+    report["label_decode_1"] = measure(lambda: label_encoder.inverse_transform([0]), args.repeat)
+    report["label_decode_16"] = measure(lambda: label_encoder.inverse_transform(list(range(len(label_encoder.classes_))) * 4), args.repeat)
+    return report
+
+
+# Fungsi membuat foto daun tiruan yang unik per index (hash berbeda, ukuran kecil)
+def stub_photo(index, size=(640, 480)) -> bytes:
+    import io
+    pixels = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    pixels[..., 1] = np.linspace(60, 200, size[0], dtype=np.uint8)
+    rng = np.random.default_rng(index)
+    y, x = rng.integers(0, size[1] - 16), rng.integers(0, size[0] - 16)
+    pixels[y:y + 16, x:x + 16] = rng.integers(0, 255, 3, dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def bench_e2e(args):
+    """The whole API with a stub model: login -> create plant -> predict -> history -> feedback.
+
+    Each client registers its own user; every flow uploads a distinct photo, so the
+    prediction cache never hits. Uploads go to a temporary STORAGE_ROOT.
+    """
+    import tempfile
+    import httpx
+    upload_root = tempfile.mkdtemp(prefix="bench-uploads-")
+    os.environ.setdefault("STORAGE_ROOT", upload_root)
+    os.environ.setdefault("LOGIN_ATTEMPTS_PER_ACCOUNT", "1000000")
+    os.environ.setdefault("LOGIN_ATTEMPTS_PER_IP", "1000000")
+    os.environ.setdefault("METRICS_ENABLED", "false")
+    use_benchmark_database(args.rows)
+    import main
+    from model_registry import LoadedModel
+
+    main.detection.model_registry.install(LoadedModel(StubBackend(), stub_label_encoder()))
+    clients = max(1, min(args.clients, args.requests))
+    photos = [stub_photo(i) for i in range(args.requests)]
+    steps = {name: [] for name in ("login", "create_plant", "predict", "history", "feedback")}
+    errors = 0
+
+    class FlowError(Exception):
+        pass
+
+    async def step(name, request):
+        start = time.perf_counter()
+        response = await request
+        steps[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise FlowError(f"{name}: {response.status_code}")
+        return response.json()
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        users = []
+        for n in range(clients):
+            email, password = f"bench{n}-{os.getpid()}@plantix.id", "bench-password"
+            await client.post("/auth/register", data={"username": email.split("@")[0], "email": email, "password": password})
+            users.append((email, password))
+
+        remaining = iter(range(args.requests))
+
+        async def worker(email, password):
+            nonlocal errors
+            for i in remaining:
+                try:
+                    login = await step("login", client.post("/auth/login", data={"username": email, "password": password}))
+                    user_id = login["userId"]
+                    plant = await step("create_plant", client.post("/plant/create", data={"userId": user_id, "nama": f"bench{i}"}))
+                    plant_id = plant["data"]["id"]
+                    detection = await step("predict", client.post(
+                        "/detection/predict", data={"userId": user_id, "plantId": plant_id},
+                        files={"image": (f"leaf{i}.jpg", photos[i], "image/jpeg")}))
+                    await step("history", client.get(f"/detection/history/{plant_id}"))
+                    await step("feedback", client.post("/feedback/create", data={
+                        "user_id": user_id, "detection_id": detection["data"]["detection"]["id"], "rating": 5, "comments": "bench"}))
+                except FlowError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(email, password) for email, password in users])
+        elapsed = time.perf_counter() - started
+
+    await main.detection.inference_engine.stop()
+    shutil.rmtree(upload_root, ignore_errors=True)
+    return {
+        "clients": clients,
+        "flows": args.requests,
+        "errors": errors,
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "throughput_flows_per_s": args.requests / elapsed,
+        "steps": {name: summarize(samples) for name, samples in steps.items()},
+    }
+
+
+async def bench_tta(args):
+    """Per-image latency of the off / auto / always TTA modes, plus accuracy with --dataset.
+
+    --dataset points at a directory with one sub-directory per class (named like the label
+    encoder's classes); without it, stub photos are used and accuracy is not reported.
+    auto only runs the augmented views below TTA_CONFIDENCE_THRESHOLD.
+    """
+    import tempfile
+    from ingest import load_image_tensor
+    from inference import top_class
+    from model_registry import LABEL_ENCODER_PATH
+    from tta import TTA_CONFIDENCE_THRESHOLD, average_predictions, tta_views
+
+    if args.backend:
+        import joblib
+        from backends import MODEL_PATHS, load_backend
+        backend, label_encoder = load_backend(args.backend, MODEL_PATHS[args.backend]), joblib.load(LABEL_ENCODER_PATH)
+    else:
+        backend, label_encoder = StubBackend(), stub_label_encoder()
+    backend.warm_up(batch_sizes=[1])
+
+    root = None
+    if args.dataset:
+        samples = [(os.path.join(args.dataset, label, name), label)
+                   for label in sorted(os.listdir(args.dataset)) if os.path.isdir(os.path.join(args.dataset, label))
+                   for name in sorted(os.listdir(os.path.join(args.dataset, label)))][:args.requests]
+    else:
+        root = tempfile.mkdtemp(prefix="bench-tta-")
+        samples = []
+        for i in range(args.requests):
+            path = os.path.join(root, f"{i}.jpg")
+            with open(path, "wb") as f:
+                f.write(stub_photo(i))
+            samples.append((path, None))
+
+    def classify(path, threshold):
+        tensor = load_image_tensor(path, (128, 128))
+        probabilities = backend.predict(tensor)[0]
+        augmented = top_class(probabilities)[1] < threshold
+        if augmented:
+            views = tta_views(path, tensor, (128, 128))
+            probabilities = average_predictions([probabilities, *backend.predict(np.concatenate(views))])
+        return top_class(probabilities)[0], augmented
+
+    report = {"backend": args.backend or "stub", "images": len(samples), "threshold": TTA_CONFIDENCE_THRESHOLD, "modes": {}}
+    for mode, threshold in (("off", 0.0), ("auto", TTA_CONFIDENCE_THRESHOLD), ("always", float("inf"))):
+        latencies, correct, augmented = [], 0, 0
+        for path, label in samples:
+            start = time.perf_counter()
+            class_index, used_tta = classify(path, threshold)
+            latencies.append(time.perf_counter() - start)
+            augmented += used_tta
+            correct += label is not None and str(label_encoder.inverse_transform([class_index])[0]) == label
+        report["modes"][mode] = {
+            "latency": summarize(latencies),
+            "tta_rate": augmented / len(samples) if samples else None,
+            "accuracy": correct / len(samples) if args.dataset and samples else None,
+        }
+    if root is not None:
+        shutil.rmtree(root)
+    return report
+
+
+async def bench_reload(args):
+    """/detection/predict under load while the model is swapped --repeat times.
+
+    Compares the latency of predictions that overlapped a load + swap with the rest and
+    counts errors and the model versions recorded on the rows. With --backend the real
+    files are reloaded through ModelRegistry.reload; otherwise a stub version is warmed
+    up on a background thread and installed, which is the same swap.
+    """
+    import tempfile
+    import httpx
+    upload_root = tempfile.mkdtemp(prefix="bench-uploads-")
+    os.environ.setdefault("STORAGE_ROOT", upload_root)
+    os.environ.setdefault("METRICS_ENABLED", "false")
+    if args.backend:
+        os.environ["INFERENCE_BACKEND"] = args.backend
+    use_benchmark_database(100)
+    import main
+    from model_registry import LoadedModel
+
+    registry = main.detection.model_registry
+    if args.backend:
+        registry.load()
+    else:
+        registry.install(LoadedModel(StubBackend(), stub_label_encoder(), "stub-0"))
+
+    def load_stub(n):
+        backend = StubBackend()
+        for batch_size in (1, 16):
+            stub_predict(np.zeros((batch_size, 128, 128, 3), dtype=np.float32))
+        return registry.install(LoadedModel(backend, stub_label_encoder(), f"stub-{n}"))
+
+    swaps, samples, versions, errors = [], [], {}, 0
+    photos = [stub_photo(i) for i in range(args.requests)]
+    remaining = iter(range(args.requests))
+    done = asyncio.Event()
+
+    async def client_worker(client):
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.post("/detection/predict", data={"userId": 1, "plantId": 1},
+                                         files={"image": (f"leaf{i}.jpg", photos[i], "image/jpeg")})
+            samples.append((start, time.perf_counter()))
+            if response.status_code != 200:
+                errors += 1
+                continue
+            version = response.json()["data"]["detection"]["model_version"]
+            versions[version] = versions.get(version, 0) + 1
+
+    async def reloader():
+        # Spread the swaps evenly over the run
+        for n in range(1, args.repeat + 1):
+            while len(samples) < n * args.requests // (args.repeat + 1) and not done.is_set():
+                await asyncio.sleep(0.01)
+            if done.is_set():
+                break
+            start = time.perf_counter()
+            await asyncio.to_thread(registry.reload, force=True) if args.backend else await asyncio.to_thread(load_stub, n)
+            swaps.append((start, time.perf_counter()))
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        reloading = asyncio.create_task(reloader())
+        await asyncio.gather(*[client_worker(client) for _ in range(max(1, args.clients))])
+        done.set()
+        await reloading
+
+    await main.detection.inference_engine.stop()
+    shutil.rmtree(upload_root, ignore_errors=True)
+    overlaps = lambda start, end: any(start < swap_end and end > swap_start for swap_start, swap_end in swaps)
+    return {
+        "backend": args.backend or "stub",
+        "requests": args.requests,
+        "errors": errors,
+        "swaps": summarize([end - start for start, end in swaps]),
+        "during_swap": summarize([end - start for start, end in samples if overlaps(start, end)]),
+        "steady": summarize([end - start for start, end in samples if not overlaps(start, end)]),
+        "model_versions": versions,
+    }
+
+
+# Fungsi menjalankan EXPLAIN untuk satu statement dengan parameter terikat
+def explain(conn, statement) -> list[str]:
+    compiled = statement.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params)]
+    return [row[0] for row in conn.exec_driver_sql("EXPLAIN " + compiled.string, params)]
+
+
+# Fungsi audit rencana query untuk endpoint daftar
+def audit_query_plans(engine) -> dict:
+    """EXPLAIN each filtered list query the way its endpoint builds it; return plans and failures.
+
+    The keyset lists are checked for the first page and a cursor page. A query fails when
+    its plan does not use the expected index, scans the table or sorts.
+    """
+    from sqlalchemy import select, text
+    from detection import DETECTION_ORDER
+    from model import Feedback, Plant, UserDetection as Detection
+    from queries import PageParams, encode_cursor, page_query
+
+    def keyset(where, index):
+        first, keys = page_query(Detection.__table__, PageParams(limit=20, cursor=None, fields=None), *where, order_by=DETECTION_ORDER, descending=True)
+
+        def cursor_page(conn):
+            rows = conn.execute(first).mappings().all()
+            # An empty table still gets a cursor page, continuing from a synthetic key
+            last = rows[-1] if rows else {"detection_date": datetime.utcnow(), "id": 0}
+            return page_query(Detection.__table__, PageParams(limit=20, cursor=encode_cursor(last, keys), fields=None),
+                              *where, order_by=DETECTION_ORDER, descending=True)[0]
+        return [(first, index), (cursor_page, index)]
+
+    audits = {
+        "/detection/": keyset((), "ix_user_detection_detection_date"),
+        "/detection/userDetections/{userId}": keyset((Detection.user_id == 7,), "ix_user_detection_user_id_detection_date"),
+        "/detection/history/{plantId}": keyset((Detection.plant_id == 7,), "ix_user_detection_plant_id_detection_date"),
+        "/feedback/user/{userId}": [(select(Feedback.__table__).where(Feedback.user_id == 7), "ix_feedback_user_id")],
+        "feedback by detection (cascade)": [(select(Feedback.id).where(Feedback.detection_id == 8), "ix_feedback_detection_id")],
+        "/plant/user/{userId}": [(select(Plant.__table__).where(Plant.user_id == 7), "ix_plant_user_id")],
+    }
+    report = {"database": engine.dialect.name, "queries": {}, "failures": []}
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        for name, statements in audits.items():
+            for page, (statement, index) in zip(("first page", "cursor page"), statements):
+                if callable(statement):
+                    statement = statement(conn)
+                label = f"{name} ({page})" if len(statements) > 1 else name
+                plan = explain(conn, statement)
+                text_plan = "\n".join(plan)
+                full_scan = any(line.startswith("SCAN ") and "USING" not in line for line in plan) or "Seq Scan" in text_plan
+                sorted_in_memory = "TEMP B-TREE" in text_plan or any(line.lstrip(" ->").startswith("Sort") for line in plan)
+                ok = index in text_plan and not full_scan and not sorted_in_memory
+                report["queries"][label] = {"index": index, "ok": ok, "plan": plan}
+                if not ok:
+                    report["failures"].append(label)
+    return report
+
+
+async def bench_explain(args):
+    """Query plan audit (see audit_query_plans) on a seeded dataset; exits non-zero on a failure.
+
+    Uses a seeded SQLite file unless DATABASE_URL points at an existing (migrated, populated)
+    database. tests/test_query_plans.py runs the same audit under pytest.
+    """
+    use_benchmark_database(args.rows)
+    from database import engine
+    report = {"rows": args.rows, **audit_query_plans(engine)}
+    engine.dispose()
+    return report
+
+
+SUITE_SCENARIOS = "micro,readers,loop-lag,auth,static,db-concurrency,e2e,explain"
+
+
+async def bench_suite(args):
+    """Run scenarios in separate interpreters (so peak RSS is per scenario) and merge their reports.
+
+    Exits non-zero when a scenario fails, so a broken scenario cannot pass for a clean report.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        "commit": commit,
+        "started_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scenarios": {},
+        "failures": [],
+    }
+    for name in args.scenarios.split(","):
+        command = [sys.executable, os.path.abspath(__file__), name, "--repeat", str(args.repeat), "--rows", str(args.rows)]
+        if args.backend:
+            command += ["--backend", args.backend]
+        result = subprocess.run(command, capture_output=True, text=True)
+        try:
+            scenario = json.loads(result.stdout)
+        except ValueError:
+            scenario = {}
+        if result.returncode != 0 or reported_errors(scenario):
+            # Keep a failing scenario's own report (e.g. explain's plans) next to the error
+            scenario["error"] = result.stderr.strip().splitlines()[-1:] or [f"exit status {result.returncode}"]
+            report["failures"].append(name)
+        report["scenarios"][name] = scenario
+    return report
+
+
+# Fungsi menghitung request gagal yang dilaporkan skenario
+def reported_errors(report) -> int:
+    """Sum every "errors" count in a scenario report, including per-mode sections."""
+    if not isinstance(report, dict):
+        return 0
+    return sum(value if key == "errors" else reported_errors(value) for key, value in report.items())
+
+
+SCENARIOS = {
+    "loop-lag": bench_loop_lag,
+    "startup": bench_startup,
+    "readers": bench_readers,
+    "db-concurrency": bench_db_concurrency,
+    "auth": bench_auth,
+    "static": bench_static,
+    "micro": bench_micro,
+    "e2e": bench_e2e,
+    "tta": bench_tta,
+    "reload": bench_reload,
+    "explain": bench_explain,
+    "suite": bench_suite,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--inline", action="store_true", help="run preprocessing and inference on the event loop")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--backend", choices=["keras", "tflite", "onnx"], help="real model for micro and tta (default: stub)")
+    parser.add_argument("--dataset", help="labelled images for tta accuracy (one sub-directory per class)")
+    parser.add_argument("--scenarios", default=SUITE_SCENARIOS, help="comma-separated scenarios for suite")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    report = asyncio.run(SCENARIOS[args.scenario](args))
+    report = {"scenario": args.scenario, **report, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    errors = reported_errors(report)
+    if errors:
+        print(f"{args.scenario}: {errors} failed requests", file=sys.stderr)
+    if report.get("failures") or errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
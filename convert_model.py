@@ -0,0 +1,94 @@
+"""Offline conversion of the Keras plant disease model to faster CPU backends.
+
+Usage:
+    python convert_model.py tflite [--quantize none|float16|int8]
+    python convert_model.py onnx [--opset 13]
+    python convert_model.py parity --backend tflite
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+import numpy as np
+from backends import INPUT_SHAPE, MODEL_PATHS, load_backend
+from ingest import load_image_tensor
+
+SAMPLE_DIRECTORY = "uploads/detections"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+# Fungsi memuat gambar contoh untuk kalibrasi dan uji paritas
+def load_sample_images(directory=SAMPLE_DIRECTORY):
+    paths = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [(str(p), load_image_tensor(p, INPUT_SHAPE[:2])) for p in paths]
+
+
+def load_keras_model():
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    return tf, tf.keras.models.load_model(MODEL_PATHS["keras"])
+
+
+def convert_tflite(args):
+    tf, model = load_keras_model()
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if args.quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif args.quantize == "int8":
+        samples = load_sample_images()
+        if not samples:
+            sys.exit(f"int8 quantization needs calibration images in {SAMPLE_DIRECTORY}")
+
+        def representative_dataset():
+            for _, tensor in samples:
+                yield [tensor]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+    output = args.output or MODEL_PATHS["tflite"]
+    Path(output).write_bytes(converter.convert())
+    print(f"Wrote {output} ({args.quantize})")
+
+
+def convert_onnx(args):
+    import tf2onnx
+    tf, model = load_keras_model()
+    signature = [tf.TensorSpec((None, *INPUT_SHAPE), tf.float32, name="input")]
+    output = args.output or MODEL_PATHS["onnx"]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=args.opset, output_path=output)
+    print(f"Wrote {output} (opset {args.opset})")
+
+
+def check_parity(args):
+    """Check that the converted backend predicts the same labels as Keras on the sample images."""
+    samples = load_sample_images()
+    if not samples:
+        sys.exit(f"No sample images found in {SAMPLE_DIRECTORY}")
+    reference = load_backend("keras")
+    candidate = load_backend(args.backend, args.output)
+    mismatches = 0
+    for path, tensor in samples:
+        expected = reference.predict(tensor)[0]
+        actual = candidate.predict(tensor)[0]
+        same = int(np.argmax(expected)) == int(np.argmax(actual))
+        mismatches += not same
+        print(f"{'ok  ' if same else 'FAIL'} {path}: keras={np.argmax(expected)} ({expected.max():.3f}) "
+              f"{args.backend}={np.argmax(actual)} ({actual.max():.3f})")
+    print(f"{len(samples) - mismatches}/{len(samples)} labels match")
+    sys.exit(1 if mismatches else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["tflite", "onnx", "parity"])
+    parser.add_argument("--quantize", choices=["none", "float16", "int8"], default="none")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--backend", choices=["tflite", "onnx"], default="tflite", help="backend checked by parity")
+    parser.add_argument("--output", help="converted model path (defaults to the backend's model file)")
+    args = parser.parse_args()
+    {"tflite": convert_tflite, "onnx": convert_onnx, "parity": check_parity}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from typing import Annotated
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from dotenv import load_dotenv
+import os
+import threading
+import time
+
+load_dotenv()
+
+# Connection settings (see .env)
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise RuntimeError("DATABASE_URL is not set")
+
+# Fungsi menurunkan URL driver async dari DATABASE_URL
+def to_async_url(url: str) -> str:
+    """Map a sync SQLAlchemy URL onto its async driver (asyncpg / aiosqlite)."""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Pool sizing: each worker may open up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections,
+# so keep (workers x that sum) below Postgres max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+class PoolMetrics:
+    """Counters for connection checkouts and time spent waiting for a free connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+def instrumented_pool(pool_class, metrics: PoolMetrics):
+    """Return a subclass of `pool_class` that times how long each checkout waits for a connection."""
+
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                connection = super().connect()
+            except Exception:
+                metrics.increment("timeouts")
+                raise
+            metrics.record_wait(time.perf_counter() - start)
+            return connection
+
+    return InstrumentedPool
+
+
+def instrument_engine(sync_engine, metrics: PoolMetrics):
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+# Sync engine: migrations, scripts and benchmarks
+pool_metrics = PoolMetrics()
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented_pool(QueuePool, pool_metrics),
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    **POOL_OPTIONS,
+)
+instrument_engine(engine, pool_metrics)
+
+# Async engine: used by the API routers so database round-trips never block the event loop
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, async_pool_metrics),
+    **POOL_OPTIONS,
+)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Fungsi dependency session database (one pooled connection per request, acquired on first query)
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+# Fungsi dependency session database async
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+def get_pool_status() -> dict:
+    return {
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+        "sync": pool_metrics.snapshot(engine.pool),
+    }
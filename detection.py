@@ -1,206 +1,469 @@
 from fastapi import APIRouter, HTTPException, Form, UploadFile, File, Request
-from database import db_dependency
-from model import UserDetection as Detection, Plant
-from PIL import Image
-import uuid
-import pandas as pd
-import sqlalchemy
-import numpy as np
-import joblib
-from pathlib import Path
+from database import AsyncSessionLocal, async_db_dependency
+from executor import run_preprocess
+from inference import BatchInferenceEngine, top_class
+from jobs import JobQueue
+from metrics import stage
+from ingest import load_image_tensor
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from disease_info import DETAIL_FIELDS, DISEASE_INFO_VERSION, get_disease_info, hydrate_detection
+from queries import dialect_insert, fetch_all, fetch_one, insert_many, page_dependency, paginate, project, stream_json
+from storage import StoredFile, storage
+from summaries import SUMMARY_COLUMNS, get_plant_summary, get_user_summary, record_detections
+from tta import TTA_MODE, average_predictions, needs_tta, tta_views
+from thumbnails import schedule_variants, variant_urls, with_variant_urls
+from model import DetectionJob as Job, UserDetection as Detection
+from sqlalchemy import and_, insert, or_, select, update
+from datetime import datetime, timedelta
+import asyncio
 import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # Menghilangkan INFO dan WARNING
-import tensorflow as tf
+import uuid
 
 router = APIRouter(
     prefix='/detection',
     tags=['detection']
 )
 
-UPLOAD_DIRECTORY = "uploads/detections"
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)  # Create the directory if it doesn't exist
-
-# Fungsi membuat Filename baru
-def generate_new_filename(file, Id):
-    """Generate a new filename based on a specific format."""
-    file_extension = file.filename.split(".")[-1]  # Get the file extension
-    new_filename = f"imagesDetection{Id}{str(uuid.uuid4())[:8]}.{file_extension}"  # Create a new filename using UUID
-    return new_filename
-
-# Fungsi menyimpan file secara lokal
-def save_file_locally(file: UploadFile, filename: str) -> str:
-    """Save uploaded file locally and return its path."""
-    file_path = Path(UPLOAD_DIRECTORY) / filename
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-    return str(file_path)
-
-# Fungsi untuk preprocess gambar
-def preprocess_image(image, target_size):
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    image = image.resize(target_size)
-    image = np.array(image) / 255.0
-    image = np.expand_dims(image, axis=0)
-    return image
-
-# Load the trained model
-model = tf.keras.models.load_model('updated_plant_disease_model.keras')
-
-# Load the LabelEncoder pkl file
-label_encoder = joblib.load('updated_label_encoder.pkl')
-
-# Data information dictionary
-data_info = {
-    'Bacteria': {
-        'symptoms': "Daun menguning di sisi daun;Terdapat bercak atau berwarna gelap di sekitar area menguning;Lesi bermata hitam;Bintik-bintik cokelat dengan lingkaran cahaya kuning;Daun kering, layu dan rontok",
-        'cause': "Kelembapan Tanah tidak tepat, terlalu banyak air;Kekurangan Nutrisi, salah satunya adalah nitrogen;Cahaya yang tidak sesuai (terlalu banyak terkena cahaya matahari langsung atau kurang terkena matahari);Infeksi bakteri",
-        'treatment': "Menyiram tanaman ketika atas tanah sekitar 2-3 inci mulai kering.;Berikan bubuk yang seimbang sesuai dengan kebutuhan tanaman.;Tempatkan tanaman di lokasi yang tidak langsung terkena cahaya matahari.;Menyemprot daun dengan larutan air sabun atau obat pengusir serangga.;Jaga kebersihan tanah dan sterilisasi alat yang digunakan."
-    },
-    'Fungus': {
-        'symptoms': "Daun menggulung;Munculnya bercak berwarna coklat, kuning, hitam atau abu-abu pada daun.;Tanaman layu meskipun telah disiram dengan cukup.",
-        'cause': "Tanaman Kekurangan Nutrisi;Kelembaban tinggi dikarenakan seringnya menyiram tanaman;Kurangnya sirkulasi udara;Tanah atau media tanam terinfeksi jamur;Menyebar melalui serangga",
-        'treatment': "Menggunakan fungisida dengan dosis yang tepat dan sesuai;Siram tanaman pada pagi hari, hindari menyirami tanaman terlalu sering.;Sterilisasi alat yang digunakan dalam merawat tanaman.;Sediakan tempat penanaman yang terkena matahari, memiliki drainase yang baik serta memiliki sirkulasi udara yang baik."
-    },
-    'Pests': {
-        'symptoms': "Daun menguning atau terbakar;Muncul bercak cokelat pada daun;Daun menggulung atau berkerut",
-        'cause': "Penggunaan pestisida yang berlebihan;Jenis pestisida tidak sesuai dengan tanaman;Pencampuran pestisida yang tidak sesuai",
-        'treatment': "Menggunakan pestisida dengan dosis yang tepat dan sesuai.;Hindari kontak langsung dengan bagian tanaman yang sensitive seperti pucuk daun.;Potong bagian tanaman yang rusak untuk mencegah penyebaran lebih lanjut."
-    },
-    'Virus': {
-        'symptoms': "Bintik-bintik atau pita kuning di sepanjang urat daun.;Daun rontok;Muncul bercak atau cincin berwarna kuning, coklat atau putih pada daun.",
-        'cause': "Disebarkan oleh serangga;Hama kutu daun;Alat yang digunakan terkontaminasi virus",
-        'treatment': "Pangkas bagian yang terinfeksi.;Hindari menyentuh tanaman (selalu mencuci tangan sebelum dan sesudah merawat tanaman);Menggunakan insektisida yang tepat untuk membasmi serangga;Sterilisasi alat yang digunakan dalam merawat tanaman."
-    },
-    'Healthy' : {
-        'symptoms': "Tanaman sehat",
-        'cause': 'Tanaman sehat',
-        'treatment': "Siram tanaman secara teratur, tetapi jangan berlebihan.;Pastikan tanaman mendapatkan cahaya yang cukup setiap hari.; Bersihkan daun secara rutin dari debu dan kotoran.;Pindahkan ke pot yang lebih besar jika diperlukan untuk pertumbuhan."
-    }
-}
+UPLOAD_NAMESPACE = "detections"
+
+# Fungsi menyimpan file ke storage
+def save_file_locally(file: UploadFile) -> StoredFile:
+    """Store the upload under its content hash; identical uploads share one stored file."""
+    return storage.save(file, UPLOAD_NAMESPACE)
+
+# The model (Keras, TFLite or ONNX) and label encoder load lazily or at app startup
+model_registry = ModelRegistry()
+
+# Fungsi prediksi satu batch (module level so it can be sent to a process pool)
+def predict_batch(batch, model=None):
+    return (model or model_registry.get()).backend.predict(batch)
+
+# Batch concurrent predictions into a single forward pass
+inference_engine = BatchInferenceEngine(predict_batch)
+
+# Cache predictions for re-uploaded images (invalidated when a different model version is served)
+prediction_cache = PredictionCache(lambda: model_registry.version)
+
+# Fungsi klasifikasi beberapa gambar yang sudah tersimpan
+async def classify_images(images: list[tuple[str, str]], accurate: bool = False) -> list[tuple[str, float, str]]:
+    """Return (category, confidence, model_version) for each stored (path, digest) and schedule their preview variants.
+
+    Images the prediction cache has not seen go through the model together, all on the model
+    version that was current when they started (a reload meanwhile does not affect them). With TTA enabled
+    (TTA_MODE=auto or `accurate`), images below the confidence threshold get a second batched
+    pass over augmented views and the averaged probabilities decide the answer.
+    """
+    use_tta = accurate or TTA_MODE == "auto"
+
+    # Duplicates share the stored file and reuse the prediction
+    with stage("cache_lookup"):
+        cached = await asyncio.gather(*[run_preprocess(prediction_cache.get, digest) for _, digest in images])
+    # A low-confidence answer cached without TTA is recomputed when TTA is wanted
+    cached = [None if entry is not None and not entry.get('tta') and needs_tta(entry['confidence_score'], use_tta) else entry for entry in cached]
+    misses = [i for i, entry in enumerate(cached) if entry is None]
+
+    # Preview variants are written in the background; the response only needs their URLs
+    for path in dict.fromkeys(path for path, _ in images):
+        schedule_variants(path, publish=storage.publish)
+
+    # Decode (reduced for large JPEGs) and preprocess the new files in parallel
+    processed = await asyncio.gather(*[run_preprocess(load_image_tensor, images[i][0], target_size=(128, 128)) for i in misses])
+
+    version = model_registry.version
+    results = [(entry['category'], entry['confidence_score'], entry.get('model_version', version)) if entry is not None else None for entry in cached]
+    if misses:
+        # Pin the served model so inference and label decoding use the same version
+        model = await run_preprocess(model_registry.get)
+
+        # Predict the images (batched with each other and with other pending requests)
+        with stage("inference"):
+            probabilities = await inference_engine.predict_proba_many(processed[:len(misses)], model)
+
+        # Hard images only: augmented views of all of them go through one more batched pass
+        uncertain = [n for n, row in enumerate(probabilities) if needs_tta(top_class(row)[1], use_tta)]
+        if uncertain:
+            views = await asyncio.gather(*[
+                run_preprocess(tta_views, images[misses[n]][0], processed[n], target_size=(128, 128)) for n in uncertain
+            ])
+            with stage("tta_inference"):
+                view_probabilities = await inference_engine.predict_proba_many([view for image_views in views for view in image_views], model)
+            offset = 0
+            for n, image_views in zip(uncertain, views):
+                probabilities[n] = average_predictions([probabilities[n], *view_probabilities[offset:offset + len(image_views)]])
+                offset += len(image_views)
+        predictions = [top_class(row) for row in probabilities]
+
+        # Map the predicted indices to the actual labels using the label encoder
+        with stage("label_decode"):
+            labels = model.label_encoder.inverse_transform([class_index for class_index, _ in predictions])
+
+        augmented = set(uncertain)
+        for n, (i, label, (_, confidence_score)) in enumerate(zip(misses, labels, predictions)):
+            results[i] = (str(label), confidence_score, model.version)
+            await run_preprocess(prediction_cache.put, images[i][1], {
+                'image_path': images[i][0],
+                'category': results[i][0],
+                'confidence_score': confidence_score,
+                'model_version': model.version,
+                'tta': n in augmented
+            }, model.version)
+    return results
+
+# Fungsi klasifikasi gambar yang sudah tersimpan
+async def classify_image(image_path: str, digest: str, accurate: bool = False) -> tuple[str, float, str]:
+    return (await classify_images([(image_path, digest)], accurate))[0]
 
 @router.post("/predict")
-async def predict_image(db: db_dependency, userId: int = Form(...),plantId: int = Form(...) ,image: UploadFile = File(...), request: Request):
+async def predict_image(db: async_db_dependency, request: Request, userId: int = Form(...), plantId: int = Form(...), image: UploadFile = File(...), accurate: bool = Form(False)):
     if image.content_type.split("/")[0] != "image":
         raise HTTPException(status_code=400, detail="Invalid image file")
     try:
-        # Generate a new filename
-        new_filename = generate_new_filename(image, userId)
-
-        # Save file locally
-        image_path = save_file_locally(image, new_filename)
-
-        # Load the image from the saved file
-        image = Image.open(image_path)
-        
-        # Preprocess the image
-        processed_image = preprocess_image(image, target_size=(128, 128))
-        
-        # Predict the image
-        prediction = model.predict(processed_image)
-        predicted_class_index = np.argmax(prediction, axis=1)[0]
-
-        # Map the predicted index to the actual label using the label encoder
-        predicted_class_label = label_encoder.inverse_transform([predicted_class_index])[0]
-        
-        # Get the corresponding row from the dataset
-        info = data_info.get(predicted_class_label, {})
-        category = predicted_class_label
-        symptoms = info.get('symptoms', 'No symptoms available')
-        cause = info.get('cause', 'No cause information available')
-        treatment = info.get('treatment', 'No treatment information available')
-        confidence_score = float(prediction[0][predicted_class_index])  # Convert numpy.float32 to float
-
-        # Create full URL for the image
-        base_url = str(request.base_url)  # Get the base URL from the request
-        full_image_url = f"{base_url}{image_path}"  # Combine base URL with image path
-
-        # Save the results to the database
-        new_detection = Detection(
-            user_id=userId,
-            plant_id=plantId,
-            category=category,
-            symptoms=symptoms,
-            cause=cause,
-            treatment=treatment,
-            confidence_score=confidence_score,
-            image_url=full_image_url
-        )
-        db.add(new_detection)
-        db.commit()
-        db.refresh(new_detection)
+        # Stream the upload into storage, hashing it on the way
+        with stage("upload_write"):
+            stored = await run_preprocess(save_file_locally, image)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        category, confidence_score, model_version = await classify_image(stored.path, stored.digest, accurate)
+
+        # Create full URL for the image from its storage key
+        full_image_url = storage.url(stored.key, str(request.base_url))
+
+        # Save the results to the database; the disease text is referenced by category and version
+        with stage("db_commit"):
+            inserted = await db.execute(insert(Detection.__table__).values(
+                user_id=userId,
+                plant_id=plantId,
+                category=category,
+                info_version=DISEASE_INFO_VERSION,
+                confidence_score=confidence_score,
+                model_version=model_version,
+                image_url=full_image_url
+            ).returning(*Detection.__table__.c))
+            detection_row = dict(inserted.mappings().one())
+            await record_detections(db, [detection_row])
+            await db.commit()
 
         return {
             "status": 200,
             "msg": "Success Upload and Detect",
             "data": {
-                "detection": new_detection,
-                "image_url": full_image_url
+                "detection": with_detection_variants(detection_row),
+                "image_url": full_image_url,
+                "image_variants": variant_urls(full_image_url)
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/")
-async def get_detections(db: db_dependency):
-    with db.connection() as conn:
-        query = sqlalchemy.text(
-            'SELECT * FROM public.user_detection'
+# Maximum photos accepted by /predict/batch in one request
+DETECTION_BATCH_MAX_IMAGES = int(os.getenv("DETECTION_BATCH_MAX_IMAGES", "10"))
+
+# Fungsi menentukan diagnosis tingkat tanaman dari beberapa foto
+def aggregate_verdict(results: list[tuple[str, float]]) -> dict:
+    """Pick the category with the highest summed confidence across photos of one plant."""
+    scores, votes = {}, {}
+    for category, confidence_score in results:
+        scores[category] = scores.get(category, 0.0) + confidence_score
+        votes[category] = votes.get(category, 0) + 1
+    category = max(scores, key=scores.get)
+    return {
+        "category": category,
+        "confidence_score": scores[category] / len(results),
+        "votes": votes,
+        **get_disease_info(category)
+    }
+
+@router.post("/predict/batch")
+async def predict_images(db: async_db_dependency, request: Request, userId: int = Form(...), plantId: int = Form(...), images: list[UploadFile] = File(...), accurate: bool = Form(False)):
+    if len(images) > DETECTION_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {DETECTION_BATCH_MAX_IMAGES} images per request")
+    if any(image.content_type.split("/")[0] != "image" for image in images):
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    try:
+        # Stream every upload into storage in parallel
+        with stage("upload_write"):
+            stored = await asyncio.gather(*[run_preprocess(save_file_locally, image) for image in images])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        results = await classify_images([(item.path, item.digest) for item in stored], accurate)
+
+        # One multi-row insert and one commit for the whole set
+        base_url = str(request.base_url)
+        with stage("db_commit"):
+            detections = await insert_many(
+                db,
+                Detection.__table__,
+                [
+                    dict(
+                        user_id=userId,
+                        plant_id=plantId,
+                        category=category,
+                        info_version=DISEASE_INFO_VERSION,
+                        confidence_score=confidence_score,
+                        model_version=model_version,
+                        image_url=storage.url(item.key, base_url)
+                    )
+                    for item, (category, confidence_score, model_version) in zip(stored, results)
+                ]
+            )
+            await record_detections(db, detections)
+            await db.commit()
+        for row in detections:
+            with_detection_variants(row)
+
+        return {
+            "status": 200,
+            "msg": "Success Upload and Detect Batch",
+            "data": {
+                "detections": detections,
+                "verdict": aggregate_verdict([(category, confidence_score) for category, confidence_score, _ in results])
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Submit-then-poll: jobs stuck in "running" this long (worker crashed) are picked up again
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A finished job is returned again for the same upload only within this window (client retries)
+JOB_DEDUPE_SECONDS = int(os.getenv("JOB_DEDUPE_SECONDS", "900"))
+JOB_PENDING_STATUSES = ('queued', 'running')
+
+# Fungsi kondisi job yang boleh diproses
+def job_is_pending():
+    stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    return and_(
+        Job.attempts < JOB_MAX_ATTEMPTS,
+        or_(Job.status == 'queued', and_(Job.status == 'running', Job.updated_at < stale))
+    )
+
+# Fungsi mengambil job yang belum selesai (untuk worker dan setelah restart)
+async def fetch_pending_jobs(limit: int) -> list[str]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Job.id).where(job_is_pending()).order_by(Job.created_at).limit(limit))
+        return list(result.scalars())
+
+# Fungsi menjalankan satu job deteksi
+async def run_detection_job(job_id: str):
+    async with AsyncSessionLocal() as db:
+        # Claim atomically so a job delivered twice (or seen by two app workers) runs once
+        claimed = await db.execute(
+            update(Job.__table__)
+            .where(Job.id == job_id, job_is_pending())
+            .values(status='running', attempts=Job.attempts + 1, updated_at=datetime.utcnow())
+        )
+        await db.commit()
+        if claimed.rowcount != 1:
+            return
+        job = await fetch_one(db, select(Job.__table__).where(Job.id == job_id))
+        try:
+            category, confidence_score, model_version = await classify_image(storage.path(job['image_key']), job['image_digest'])
+            detection_row = (await db.execute(
+                insert(Detection.__table__)
+                .values(
+                    user_id=job['user_id'],
+                    plant_id=job['plant_id'],
+                    category=category,
+                    info_version=DISEASE_INFO_VERSION,
+                    confidence_score=confidence_score,
+                    model_version=model_version,
+                    image_url=job['image_url']
+                )
+                .returning(*SUMMARY_COLUMNS)
+            )).mappings().one()
+            await record_detections(db, [detection_row])
+            values = dict(status='done', detection_id=detection_row['id'], error=None)
+        except Exception as e:
+            await db.rollback()
+            values = dict(status='failed', error=str(e))
+        # The detection row and the job result commit together
+        await db.execute(update(Job.__table__).where(Job.id == job_id).values(updated_at=datetime.utcnow(), **values))
+        await db.commit()
+
+# Worker pool for detection jobs (started in the app lifespan)
+detection_jobs = JobQueue(run_detection_job, fetch_pending=fetch_pending_jobs)
+
+@router.post("/jobs", status_code=202)
+async def submit_detection_job(db: async_db_dependency, request: Request, userId: int = Form(...), plantId: int = Form(...), image: UploadFile = File(...)):
+    if image.content_type.split("/")[0] != "image":
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    try:
+        # Persist the upload first; inference happens after the response is sent
+        with stage("upload_write"):
+            stored = await run_preprocess(save_file_locally, image)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A client retrying after a timeout gets its earlier job back instead of a second one;
+    # the same photo uploaded again later is a new job
+    same_upload = and_(Job.image_digest == stored.digest, Job.user_id == userId, Job.plant_id == plantId)
+    recent = datetime.utcnow() - timedelta(seconds=JOB_DEDUPE_SECONDS)
+    job = await fetch_one(db, select(Job.id, Job.status).where(
+        same_upload, Job.status == 'done', Job.created_at >= recent
+    ).order_by(Job.created_at.desc()).limit(1))
+    if job is None:
+        # A job that crashed on its last attempt would otherwise hold the pending slot forever
+        stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        await db.execute(update(Job.__table__).where(
+            same_upload, Job.status == 'running', Job.attempts >= JOB_MAX_ATTEMPTS, Job.updated_at < stale
+        ).values(status='failed', error='Abandoned after the last attempt', updated_at=datetime.utcnow()))
+
+        # The partial unique index on pending jobs decides between concurrent submissions
+        statement = dialect_insert(db, Job.__table__).values(
+            id=uuid.uuid4().hex,
+            user_id=userId,
+            plant_id=plantId,
+            status='queued',
+            image_key=stored.key,
+            image_digest=stored.digest,
+            image_url=storage.url(stored.key, str(request.base_url)),
+            attempts=0
         )
-        detections = pd.read_sql(query, conn)
+        inserted = await db.execute(statement.on_conflict_do_nothing(
+            index_elements=[Job.user_id, Job.plant_id, Job.image_digest],
+            index_where=Job.status.in_(JOB_PENDING_STATUSES),
+        ).returning(Job.id, Job.status))
+        created = inserted.mappings().first()
+        job = dict(created) if created is not None else await fetch_one(db, select(Job.id, Job.status).where(
+            same_upload, Job.status != 'failed'
+        ).order_by(Job.created_at.desc()).limit(1))
+        await db.commit()
+        if job is None:
+            raise HTTPException(status_code=409, detail="Detection job changed state, retry the upload")
+        if created is not None:
+            detection_jobs.submit(job["id"])
+
+    return {
+        "status": 202,
+        "msg": "Detection job accepted",
+        "data": {
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"{request.base_url}detection/jobs/{job['id']}"
+        }
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_detection_job(job_id: str, db: async_db_dependency):
+    job = await fetch_one(db, select(
+        Job.id, Job.status, Job.detection_id, Job.error, Job.created_at, Job.updated_at
+    ).where(Job.id == job_id))
+
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Detection job {job_id} not found")
+
+    job["job_id"] = job.pop("id")
+    job["detection"] = None
+    if job["detection_id"] is not None:
+        detection_row = await fetch_one(db, select(Detection.__table__).where(Detection.id == job["detection_id"]))
+        job["detection"] = with_detection_variants(detection_row) if detection_row else None
+
+    return {
+        "status": 200,
+        "msg": "Success Get Detection Job",
+        "data": job
+    }
+
+@router.get("/summary/plant/{plantId}")
+async def get_plant_detection_summary(plantId: int, db: async_db_dependency):
+    data = await get_plant_summary(db, plantId)
+
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Plant with plantId {plantId} has no detections")
+
+    return {
+        "status": 200,
+        "msg": "Success Get Plant Detection Summary",
+        "data": data
+    }
+
+@router.get("/summary/user/{userId}")
+async def get_user_detection_summary(userId: int, db: async_db_dependency):
+    data = await get_user_summary(db, userId)
+
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"User with userId {userId} has no detections")
+
+    return {
+        "status": 200,
+        "msg": "Success Get User Detection Summary",
+        "data": data
+    }
+
+# Fungsi menambahkan URL thumbnail ke baris deteksi
+def with_detection_variants(row: dict) -> dict:
+    return with_variant_urls(hydrate_detection(row), 'image_url', 'image_variants')
+
+# Newest first; id breaks ties between detections saved in the same instant
+DETECTION_ORDER = (Detection.detection_date, Detection.id)
+
+# Fungsi kolom tambahan agar teks penyakit bisa diisi pada projection fields=
+def detail_columns(fields: str = None) -> tuple:
+    """Columns hydrate_detection needs when fields= asks for symptoms, cause or treatment."""
+    names = [name.strip() for name in (fields or "").split(",")]
+    if fields and any(field in names for field in DETAIL_FIELDS):
+        return (Detection.category, Detection.info_version)
+    return ()
+
+@router.get("/")
+async def get_detections(db: async_db_dependency, page: page_dependency, stream: bool = False):
+    if stream:
+        query = select(*project(Detection.__table__, page.fields, required=detail_columns(page.fields)))
+        return stream_json(db, query, msg="Success Get Detections", transform=with_detection_variants)
+    data, next_cursor = await paginate(db, Detection.__table__, page, order_by=DETECTION_ORDER, descending=True, required=detail_columns(page.fields))
+    for row in data:
+        with_detection_variants(row)
     return {
         "status": 200,
         "msg": "Success Get Detections",
-        "data": detections.to_dict('records')
+        "data": data,
+        "next_cursor": next_cursor
     }
 
 @router.get("/detail")
-async def get_detection_detail(detectionId: int, db: db_dependency):
-    with db.connection() as conn:
-        query = sqlalchemy.text(
-            'SELECT * FROM public.user_detection WHERE id = :detectionId'
-        )
-        data = pd.read_sql(query, conn, params={'detectionId': detectionId})
+async def get_detection_detail(detectionId: int, db: async_db_dependency):
+    data = [with_detection_variants(row) for row in await fetch_all(db, select(Detection.__table__).where(Detection.id == detectionId))]
 
-    if data.empty:
+    if not data:
         raise HTTPException(status_code=404, detail=f"Detection with detectionId {detectionId} not found")
 
     return {
         "status": 200,
         "msg": "Success Get Detection Details",
-        "data": data.to_dict('records')
+        "data": data
     }
 
 @router.get("/userDetections/{userId}")
-async def get_user_detections(userId: int, db: db_dependency):
-    with db.connection() as conn:
-        query = sqlalchemy.text(
-            'SELECT * FROM public.user_detection WHERE user_id = :userId'
-        )
-        data = pd.read_sql(query, conn, params={'userId': userId})
+async def get_user_detections(userId: int, db: async_db_dependency, page: page_dependency):
+    data, next_cursor = await paginate(db, Detection.__table__, page, Detection.user_id == userId, order_by=DETECTION_ORDER, descending=True, required=detail_columns(page.fields))
+    for row in data:
+        with_detection_variants(row)
 
-    if data.empty:
+    if not data and page.cursor is None:
         raise HTTPException(status_code=404, detail=f"User with userId {userId} has no detections")
 
     return {
         "status": 200,
         "msg": "Success Get User Detections",
-        "data": data.to_dict('records')
+        "data": data,
+        "next_cursor": next_cursor
     }
 
 @router.get("/history/{plantId}")
-async def get_detection_detail(plantId: int, db: db_dependency):
-    with db.connection() as conn:
-        query = sqlalchemy.text(
-            'SELECT * FROM public.user_detection WHERE plant_id = :plantId'
-        )
-        data = pd.read_sql(query, conn, params={'plantId': plantId})
+async def get_detection_history(plantId: int, db: async_db_dependency, page: page_dependency):
+    data, next_cursor = await paginate(db, Detection.__table__, page, Detection.plant_id == plantId, order_by=DETECTION_ORDER, descending=True, required=detail_columns(page.fields))
+    for row in data:
+        with_detection_variants(row)
 
-    if data.empty:
+    if not data and page.cursor is None:
         raise HTTPException(status_code=404, detail=f"Detection with detectionId {plantId} not found")
 
     return {
         "status": 200,
         "msg": "Success Get Detection History",
-        "data": data.to_dict('records')
+        "data": data,
+        "next_cursor": next_cursor
     }
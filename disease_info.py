@@ -0,0 +1,62 @@
+# Version of the reference text below; bump it (keeping the old entry) when the text changes
+DISEASE_INFO_VERSION = 1
+
+# Data information dictionary, per version
+DISEASE_INFO = {
+    1: {
+        'Bacteria': {
+            'symptoms': "Daun menguning di sisi daun;Terdapat bercak atau berwarna gelap di sekitar area menguning;Lesi bermata hitam;Bintik-bintik cokelat dengan lingkaran cahaya kuning;Daun kering, layu dan rontok",
+            'cause': "Kelembapan Tanah tidak tepat, terlalu banyak air;Kekurangan Nutrisi, salah satunya adalah nitrogen;Cahaya yang tidak sesuai (terlalu banyak terkena cahaya matahari langsung atau kurang terkena matahari);Infeksi bakteri",
+            'treatment': "Menyiram tanaman ketika atas tanah sekitar 2-3 inci mulai kering.;Berikan bubuk yang seimbang sesuai dengan kebutuhan tanaman.;Tempatkan tanaman di lokasi yang tidak langsung terkena cahaya matahari.;Menyemprot daun dengan larutan air sabun atau obat pengusir serangga.;Jaga kebersihan tanah dan sterilisasi alat yang digunakan."
+        },
+        'Fungus': {
+            'symptoms': "Daun menggulung;Munculnya bercak berwarna coklat, kuning, hitam atau abu-abu pada daun.;Tanaman layu meskipun telah disiram dengan cukup.",
+            'cause': "Tanaman Kekurangan Nutrisi;Kelembaban tinggi dikarenakan seringnya menyiram tanaman;Kurangnya sirkulasi udara;Tanah atau media tanam terinfeksi jamur;Menyebar melalui serangga",
+            'treatment': "Menggunakan fungisida dengan dosis yang tepat dan sesuai;Siram tanaman pada pagi hari, hindari menyirami tanaman terlalu sering.;Sterilisasi alat yang digunakan dalam merawat tanaman.;Sediakan tempat penanaman yang terkena matahari, memiliki drainase yang baik serta memiliki sirkulasi udara yang baik."
+        },
+        'Pests': {
+            'symptoms': "Daun menguning atau terbakar;Muncul bercak cokelat pada daun;Daun menggulung atau berkerut",
+            'cause': "Penggunaan pestisida yang berlebihan;Jenis pestisida tidak sesuai dengan tanaman;Pencampuran pestisida yang tidak sesuai",
+            'treatment': "Menggunakan pestisida dengan dosis yang tepat dan sesuai.;Hindari kontak langsung dengan bagian tanaman yang sensitive seperti pucuk daun.;Potong bagian tanaman yang rusak untuk mencegah penyebaran lebih lanjut."
+        },
+        'Virus': {
+            'symptoms': "Bintik-bintik atau pita kuning di sepanjang urat daun.;Daun rontok;Muncul bercak atau cincin berwarna kuning, coklat atau putih pada daun.",
+            'cause': "Disebarkan oleh serangga;Hama kutu daun;Alat yang digunakan terkontaminasi virus",
+            'treatment': "Pangkas bagian yang terinfeksi.;Hindari menyentuh tanaman (selalu mencuci tangan sebelum dan sesudah merawat tanaman);Menggunakan insektisida yang tepat untuk membasmi serangga;Sterilisasi alat yang digunakan dalam merawat tanaman."
+        },
+        'Healthy' : {
+            'symptoms': "Tanaman sehat",
+            'cause': 'Tanaman sehat',
+            'treatment': "Siram tanaman secara teratur, tetapi jangan berlebihan.;Pastikan tanaman mendapatkan cahaya yang cukup setiap hari.; Bersihkan daun secara rutin dari debu dan kotoran.;Pindahkan ke pot yang lebih besar jika diperlukan untuk pertumbuhan."
+        }
+    },
+}
+
+DETAIL_FIELDS = ('symptoms', 'cause', 'treatment')
+MISSING_TEXT = {
+    'symptoms': 'No symptoms available',
+    'cause': 'No cause information available',
+    'treatment': 'No treatment information available',
+}
+
+
+# Fungsi mengambil informasi penyakit berdasarkan kategori
+def get_disease_info(category: str, version: int = DISEASE_INFO_VERSION) -> dict:
+    """Return symptoms/cause/treatment for a category from the in-process registry."""
+    info = DISEASE_INFO.get(version, DISEASE_INFO[DISEASE_INFO_VERSION]).get(category, {})
+    return {field: info.get(field, MISSING_TEXT[field]) for field in DETAIL_FIELDS}
+
+
+# Fungsi melengkapi baris deteksi dengan teks referensi
+def hydrate_detection(row: dict) -> dict:
+    """Fill the text columns of a user_detection row that only stores the category reference.
+
+    Columns left out by a fields= projection stay out; rows that still carry their own
+    text (written before normalization and not migrated) are returned unchanged.
+    """
+    missing = [field for field in DETAIL_FIELDS if field in row and row[field] is None]
+    if missing and row.get('category') is not None:
+        info = get_disease_info(row['category'], row.get('info_version') or DISEASE_INFO_VERSION)
+        for field in missing:
+            row[field] = info[field]
+    return row
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# Execution layer configuration
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", "1"))
+
+# Thread pool for file I/O, decoding and resizing (Pillow releases the GIL)
+preprocess_executor = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+
+# Dedicated pool for TensorFlow so forward passes never queue behind image decoding
+if INFERENCE_EXECUTOR == "process":
+    # TensorFlow is not fork-safe, so child processes are spawned and load the model themselves
+    inference_executor = ProcessPoolExecutor(max_workers=INFERENCE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+else:
+    inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+# Small bounded pool for bcrypt: a login storm can use at most this many cores
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+
+# Background pool for preview variants, so encoding them never takes threads from request-path decoding
+variant_executor = ThreadPoolExecutor(max_workers=VARIANT_WORKERS, thread_name_prefix="variants")
+
+
+async def run_preprocess(fn, *args, **kwargs):
+    """Run a blocking I/O or image-processing call on the preprocess pool."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. the metrics route label) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(preprocess_executor, partial(context.run, fn, *args, **kwargs))
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a model call on the inference pool. `fn` must be picklable in process mode."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, partial(fn, *args, **kwargs))
+
+
+async def run_password_hash(fn, *args, **kwargs):
+    """Run a bcrypt hash/verify call on the password pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, partial(fn, *args, **kwargs))
+
+
+async def run_variants(fn, *args, **kwargs):
+    """Run a preview-variant encode on the variant pool."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(variant_executor, partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Stop all pools, waiting for work that is already running."""
+    preprocess_executor.shutdown(wait=True)
+    inference_executor.shutdown(wait=True)
+    password_executor.shutdown(wait=True)
+    variant_executor.shutdown(wait=True)
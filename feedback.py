@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Form
-from database import db_dependency
-from sqlalchemy.sql import text
-import pandas as pd
-import sqlalchemy
+from database import async_db_dependency
+from model import Feedback, FeedbackCreate, User, UserDetection
+from queries import BULK_MAX_ITEMS, fetch_all, insert_many, missing_ids, page_dependency, paginate, project, stream_json
+from sqlalchemy import insert, select
 
 router = APIRouter(
     prefix="/feedback",
@@ -10,66 +10,78 @@ router = APIRouter(
 )
 
 @router.get("/")
-async def get_feedbacks(db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text('SELECT * FROM public.feedback'),
-            conn
-        )
-    if data.empty:
+async def get_feedbacks(db: async_db_dependency, page: page_dependency, stream: bool = False):
+    if stream:
+        query = select(*project(Feedback.__table__, page.fields))
+        return stream_json(db, query, msg="Success Get Feedbacks")
+    data, next_cursor = await paginate(db, Feedback.__table__, page, order_by=(Feedback.id,))
+    if not data and page.cursor is None:
         raise HTTPException(status_code=404, detail="No feedbacks found")
     return {
         "status": 200,
         "msg": "Success Get Feedbacks",
-        "data": data.to_dict('records')
+        "data": data,
+        "next_cursor": next_cursor
     }
 
 @router.post("/create")
-async def create_feedback(db: db_dependency, user_id: int = Form(...), detection_id: int = Form(...), rating: int = Form(...), comments: str = Form(...)):
+async def create_feedback(db: async_db_dependency, user_id: int = Form(...), detection_id: int = Form(...), rating: int = Form(...), comments: str = Form(...)):
     try:
         # Menggunakan parameterisasi untuk menghindari SQL Injection
-        sql = text('''
-            INSERT INTO public."feedback" (user_id, detection_id, rating, comments)
-            VALUES (:user_id, :detection_id, :rating, :comments)
-        ''')
-        db.execute(sql, {"user_id": user_id, "detection_id": detection_id, "rating": rating, "comments": comments})
-        db.commit()
+        await db.execute(
+            insert(Feedback.__table__),
+            {"user_id": user_id, "detection_id": detection_id, "rating": rating, "comments": comments}
+        )
+        await db.commit()
         return {
             "status": 201,
             "msg": "Feedback created successfully"
         }
     except Exception as e:
-        db.rollback()  # Rollback in case of error
+        await db.rollback()  # Rollback in case of error
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     
+@router.post("/bulk")
+async def create_feedbacks(db: async_db_dependency, feedbacks: list[FeedbackCreate]):
+    if not feedbacks or len(feedbacks) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BULK_MAX_ITEMS} feedback items")
+
+    # Validate the whole batch before writing anything
+    unknown_users = await missing_ids(db, User.id, [item.user_id for item in feedbacks])
+    unknown_detections = await missing_ids(db, UserDetection.id, [item.detection_id for item in feedbacks])
+    if unknown_users or unknown_detections:
+        raise HTTPException(status_code=400, detail=f"Unknown user_id: {sorted(unknown_users)}, unknown detection_id: {sorted(unknown_detections)}")
+
+    try:
+        data = await insert_many(db, Feedback.__table__, [item.model_dump() for item in feedbacks])
+        await db.commit()
+    except Exception as e:
+        await db.rollback()  # Rollback in case of error
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    return {
+        "status": 201,
+        "msg": "Feedback created successfully",
+        "data": data
+    }
+
 @router.get("/get/{feedbackId}")
-async def get_feedback_detail(feedbackId: int, db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text(
-                f'SELECT * FROM public."feedback" WHERE id = {feedbackId}'
-            ), conn
-        )
-    if data.empty:
+async def get_feedback_detail(feedbackId: int, db: async_db_dependency):
+    data = await fetch_all(db, select(Feedback.__table__).where(Feedback.id == feedbackId))
+    if not data:
         raise HTTPException(status_code=404, detail=f"Feedback not found")
     return {
         "status": 200,
         "msg": "Success Generate Feedback Detail",
-        "data": data.to_dict('records')
+        "data": data
     }
 
 @router.get("/user/{userId}")
-async def get_feedbacks_by_user(userId: int, db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text(
-                f'SELECT * FROM public."feedback" WHERE user_id = {userId}'
-            ), conn
-        )
-    if data.empty:
+async def get_feedbacks_by_user(userId: int, db: async_db_dependency):
+    data = await fetch_all(db, select(Feedback.__table__).where(Feedback.user_id == userId))
+    if not data:
         raise HTTPException(status_code=404, detail=f"Feedback not found")
     return {
         "status": 200,
         "msg": "Success Generate Feedback list",
-        "data": data.to_dict('records')
+        "data": data
     }
\ No newline at end of file
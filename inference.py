@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+import numpy as np
+from executor import run_inference
+from metrics import METRICS_ENABLED, inference_batch_size, inference_forward_seconds
+
+# Micro-batching configuration
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+
+# Fungsi mengambil kelas dengan probabilitas tertinggi
+def top_class(probabilities) -> tuple[int, float]:
+    class_index = int(np.argmax(probabilities))
+    return class_index, float(probabilities[class_index])
+
+
+class BatchInferenceEngine:
+    """Collect pending images into batches and run one forward pass per batch.
+
+    Callers may pin the model their images go through; `predict_fn` is then called as
+    `predict_fn(batch, model)` (otherwise `predict_fn(batch)`), one forward pass per model
+    present in a batch, so a model swap never mixes versions within a request.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._worker = None
+
+    @property
+    def depth(self) -> int:
+        """Images waiting for a forward pass."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the background worker on the running event loop if needed."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background worker and fail anything still queued."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference engine stopped"))
+        self._worker = None
+
+    async def predict(self, image: np.ndarray, model=None):
+        """Queue a preprocessed (1, H, W, C) image and wait for (class_index, confidence)."""
+        return (await self.predict_many([image], model))[0]
+
+    async def predict_many(self, images: list, model=None) -> list:
+        """Queue several images back to back so they share a forward pass; returns (class_index, confidence) per image."""
+        return [top_class(probabilities) for probabilities in await self.predict_proba_many(images, model)]
+
+    async def predict_proba_many(self, images: list, model=None) -> list:
+        """Like predict_many, but return each image's full probability vector."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for image in images:
+            future = loop.create_future()
+            self._queue.put_nowait((image, future, model))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting before sleeping on the queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # Callers that gave up (client disconnect) don't need a forward pass
+            batch = [item for item in batch if not item[1].done()]
+            # Only around a model reload does a batch hold images for more than one model
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[2]), []).append(item)
+            for group in groups.values():
+                await self._run_group(group)
+
+    async def _run_group(self, batch):
+        started = time.perf_counter()
+        try:
+            predictions = await self._forward([image for image, _, _ in batch], batch[0][2])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if METRICS_ENABLED:
+            inference_batch_size.observe(len(batch))
+            inference_forward_seconds.observe(time.perf_counter() - started)
+        for (_, future, _), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(np.asarray(prediction))
+
+    async def _forward(self, images, model=None):
+        # The forward pass runs on the inference pool so the event loop keeps serving requests
+        batch = np.concatenate(images, axis=0)
+        if model is None:
+            return await run_inference(self.predict_fn, batch)
+        return await run_inference(self.predict_fn, batch, model)
@@ -0,0 +1,45 @@
+import hashlib
+import os
+import numpy as np
+from fastapi import UploadFile
+from PIL import Image
+from metrics import stage
+
+# Upload ingestion configuration
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", str(256 * 1024)))
+
+
+# Fungsi menyimpan upload ke disk secara bertahap
+def stream_upload(file: UploadFile, path) -> str:
+    """Stream an upload to `path` in chunks and return the SHA-256 digest of its bytes."""
+    digest = hashlib.sha256()
+    file.file.seek(0)
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: file.file.read(INGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+# Fungsi untuk preprocess gambar
+def preprocess_image(image, target_size):
+    """Resize a PIL image and return a (1, H, W, 3) float32 tensor scaled to [0, 1]."""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # reducing_gap lets Pillow shrink by an integer factor before the bicubic pass
+    image = image.resize(target_size, reducing_gap=3.0)
+    tensor = np.asarray(image, dtype=np.float32)  # Single uint8 -> float32 copy
+    tensor *= 1.0 / 255.0
+    return tensor[np.newaxis]
+
+
+# Fungsi membuka dan preprocess gambar dari file
+def load_image_tensor(path, target_size):
+    """Decode an image at reduced size where the format allows it and preprocess it."""
+    with Image.open(path) as image:
+        # JPEG decodes directly at 1/2, 1/4 or 1/8 scale, still at least target_size
+        with stage("decode"):
+            image.draft("RGB", target_size)
+            image.load()
+        with stage("preprocess"):
+            return preprocess_image(image, target_size)
@@ -0,0 +1,76 @@
+import asyncio
+import os
+
+# Background job configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "256"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+
+class JobQueue:
+    """In-process worker pool for jobs whose state lives in the database.
+
+    `submit` hands a job id straight to an idle worker. Ids that did not fit in the
+    queue, were left behind by a restart, or were submitted by another app worker are
+    picked up by polling `fetch_pending`. `handler` must claim each job atomically, so
+    an id delivered twice is only processed once.
+    """
+
+    def __init__(self, handler, fetch_pending=None, workers: int = JOB_WORKERS, max_pending: int = JOB_QUEUE_SIZE, poll_seconds: float = JOB_POLL_SECONDS):
+        self.handler = handler
+        self.fetch_pending = fetch_pending
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.poll_seconds = poll_seconds
+        self._queue = None
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the workers (and the poller) on the running event loop if needed."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.fetch_pending is not None:
+            self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self):
+        """Cancel workers; unfinished jobs stay pending in the database for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id) -> bool:
+        """Queue a job id; returns False when the queue is full (the poller will find it later)."""
+        self.start()
+        try:
+            self._queue.put_nowait(job_id)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.handler(job_id)
+            except Exception as e:
+                print(f"Job {job_id} failed:", e)
+            finally:
+                self._queue.task_done()
+
+    async def _poll(self):
+        while True:
+            if self._queue.empty():
+                try:
+                    for job_id in await self.fetch_pending(self.max_pending):
+                        if not self.submit(job_id):
+                            break
+                except Exception as e:
+                    print("Job poll failed:", e)
+            await asyncio.sleep(self.poll_seconds)
@@ -1,13 +1,86 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import hmac
+import logging
 import os
+import re
 import auth
 import users
 import detection
 import feedback
 import plant
+from database import async_engine, get_pool_status
+from executor import run_preprocess, shutdown_executors
+from backends import INFERENCE_BACKEND
+from model_registry import MODEL_RELOAD_INTERVAL, watch_model_files
+from metrics import METRICS_ENABLED, CounterFunc, Gauge, MetricsMiddleware, instrument_queries, probe_loop_lag, registry
+from static import CachedStaticFiles
+from storage import STORAGE_ROOT, storage
+from thumbnails import VARIANT_DIRECTORY, find_original, generate_variants
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# When to load the model: "lazy" (first prediction), "startup" (background task in the
+# lifespan, default) or "import" (at import time, so `gunicorn --preload` shares it copy-on-write)
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "startup")
+# Shared secret for POST /model/reload; the endpoint is disabled when empty
+MODEL_RELOAD_TOKEN = os.getenv("MODEL_RELOAD_TOKEN", "")
+
+# TensorFlow is not fork-safe, so only backends without it may be loaded before workers fork.
+# The tflite backend must use tflite_runtime here, not its tensorflow fallback.
+FORK_SAFE_BACKENDS = ("tflite", "onnx")
+
+if MODEL_PRELOAD == "import":
+    if INFERENCE_BACKEND not in FORK_SAFE_BACKENDS:
+        raise RuntimeError(f"MODEL_PRELOAD=import is not supported for the {INFERENCE_BACKEND} backend; use startup or lazy")
+    detection.model_registry.load()
+
+# Fungsi mencatat kegagalan memuat model di background
+def report_model_load(task: asyncio.Task):
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        # The registry keeps the error for /ready; a later prediction retries the load
+        logger.error("Model load failed", exc_info=error)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loading = None
+    if MODEL_PRELOAD == "startup":
+        # Load in the background so the worker accepts traffic on other routes immediately
+        loading = asyncio.create_task(asyncio.to_thread(detection.model_registry.load))
+        loading.add_done_callback(report_model_load)
+    detection.detection_jobs.start()
+    loop_lag = asyncio.create_task(probe_loop_lag()) if METRICS_ENABLED else None
+    model_watcher = asyncio.create_task(watch_model_files(detection.model_registry)) if MODEL_RELOAD_INTERVAL > 0 else None
+    yield
+    for task in (loop_lag, model_watcher):
+        if task is not None:
+            task.cancel()
+    await detection.detection_jobs.stop()
+    if loading is not None and not loading.done():
+        loading.cancel()
+    await detection.inference_engine.stop()
+    shutdown_executors()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Metrik Prometheus: latensi per route dan per tahap, query database, antrean dan lag event loop
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_queries(async_engine.sync_engine)
+    registry.register(Gauge("plantix_inference_queue_depth", "Images waiting for a forward pass.", lambda: detection.inference_engine.depth))
+    registry.register(Gauge("plantix_job_queue_depth", "Detection jobs queued in this worker.", lambda: detection.detection_jobs.depth))
+    registry.register(Gauge(
+        "plantix_db_pool_checked_out", "Connections currently checked out of the pool.",
+        lambda: {(name,): pool["checked_out"] for name, pool in get_pool_status().items()}, ("engine",)))
+    registry.register(CounterFunc(
+        "plantix_db_pool_wait_seconds_total", "Total time spent waiting for a pooled connection.",
+        lambda: {(name,): pool["wait_seconds_total"] for name, pool in get_pool_status().items()}, ("engine",)))
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -19,10 +92,58 @@ app.include_router(feedback.router)
 def read_root():
     return {"API" : "Plantix"}
 
+@app.get("/ready")
+def read_ready():
+    model_status = detection.model_registry.status()
+    return JSONResponse(status_code=200 if model_status["ready"] else 503, content={"model": model_status})
+
+# Muat ulang model tanpa restart: versi baru dimuat dan di-warm up di background lalu ditukar
+@app.post("/model/reload")
+async def reload_model(x_reload_token: str = Header("")):
+    if not MODEL_RELOAD_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_reload_token, MODEL_RELOAD_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid reload token")
+    try:
+        model = await asyncio.to_thread(detection.model_registry.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {e}")
+    return {"status": 200, "msg": "Success Reload Model", "data": {"version": model.version, "model": detection.model_registry.status()}}
+
+@app.get("/status/pool")
+def read_pool_status():
+    return {"status": 200, "msg": "Success Get Pool Status", "data": get_pool_status()}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Path direktori untuk menyimpan file
-UPLOADS_DIRECTORY = "uploads"
+UPLOADS_DIRECTORY = STORAGE_ROOT
 if not os.path.exists(UPLOADS_DIRECTORY):
     os.makedirs(UPLOADS_DIRECTORY)
 
+# Melayani file upload (ETag, 304, Range dan Cache-Control immutable)
+uploads_files = CachedStaticFiles(directory=UPLOADS_DIRECTORY)
+
+# Varian yang belum ada (upload lama) dibuat saat pertama diminta lalu disimpan di disk
+@app.get(f"/uploads/{{directory:path}}/{VARIANT_DIRECTORY}/{{filename}}")
+async def read_image_variant(directory: str, filename: str, request: Request):
+    parts = directory.split("/")
+    if parts[0] not in (detection.UPLOAD_NAMESPACE, users.UPLOAD_NAMESPACE) or not all(re.fullmatch(r"[\w-]+", part) for part in parts):
+        raise HTTPException(status_code=404, detail="Not Found")
+    directory_path = os.path.join(UPLOADS_DIRECTORY, *parts)
+    variant_path = os.path.join(directory_path, VARIANT_DIRECTORY, filename)
+    if not os.path.isfile(variant_path):
+        original = await run_preprocess(find_original, directory_path, filename)
+        if original is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        variants = await run_preprocess(generate_variants, original, publish=storage.publish)
+        if variant_path not in variants.values():
+            raise HTTPException(status_code=404, detail="Not Found")
+    return await uploads_files.get_response(os.path.relpath(variant_path, UPLOADS_DIRECTORY), request.scope)
+
 # Tambahkan rute untuk melayani file statis
-app.mount("/uploads", StaticFiles(directory=UPLOADS_DIRECTORY), name="uploads")
\ No newline at end of file
+app.mount("/uploads", uploads_files, name="uploads")
@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# Metrics configuration; when disabled nothing is recorded and /metrics is not served
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# ASGI scope of the request being handled; stages and queries read their route label from it
+_current_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus histogram keyed by label values."""
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value(s) are read from `callback` at scrape time.
+
+    `callback` returns a number, or a dict of {label values tuple: number}.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, callback, labelnames=()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {float(value)}")
+        return lines
+
+
+class CounterFunc(Gauge):
+    """Counter whose monotonically increasing value(s) are read from `callback` at scrape time."""
+
+    type = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "plantix_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")))
+stage_seconds = registry.register(Histogram(
+    "plantix_stage_duration_seconds", "Time spent in each processing stage of a request.", ("route", "stage")))
+db_query_seconds = registry.register(Histogram(
+    "plantix_db_query_duration_seconds", "Database statement execution time by route.", ("route",)))
+inference_batch_size = registry.register(Histogram(
+    "plantix_inference_batch_size", "Images per forward pass.", buckets=BATCH_SIZE_BUCKETS))
+inference_forward_seconds = registry.register(Histogram(
+    "plantix_inference_forward_seconds", "Duration of one batched forward pass."))
+loop_lag_seconds = registry.register(Histogram(
+    "plantix_event_loop_lag_seconds", "How late a periodic event-loop tick fired."))
+
+
+# Fungsi label route untuk request yang sedang berjalan
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (e.g. /uploads) have no route object, only the mount prefix
+    return scope.get("root_path") or "unmatched"
+
+
+@contextmanager
+def _timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, current_route(), name)
+
+
+# Fungsi mengukur durasi satu tahap (upload, decode, inference, commit, ...)
+def stage(name: str):
+    """Context manager recording how long the block takes under the current route."""
+    return _timed_stage(name) if METRICS_ENABLED else nullcontext()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - start, scope["method"], current_route(), str(status))
+            _current_scope.reset(token)
+
+
+# Fungsi mencatat durasi query database per route
+def instrument_queries(sync_engine):
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        db_query_seconds.observe(time.perf_counter() - conn.info["metrics_query_start"].pop(), current_route())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        if exception_context.connection is not None:
+            starts = exception_context.connection.info.get("metrics_query_start")
+            if starts:
+                starts.pop()
+
+
+# Fungsi memantau keterlambatan event loop
+async def probe_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(0.0, loop.time() - expected))
@@ -0,0 +1,68 @@
+"""Apply pending schema migrations from migrations/ in filename order.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --list     # show applied/pending migrations
+
+Migrations are either plain .sql files or .py files defining `upgrade(conn)`.
+Each one runs in its own transaction and is recorded in schema_migrations.
+"""
+import argparse
+import importlib.util
+from pathlib import Path
+from sqlalchemy import text
+
+MIGRATIONS_DIRECTORY = Path(__file__).resolve().parent / "migrations"
+
+
+def list_migrations():
+    return sorted(p for p in MIGRATIONS_DIRECTORY.iterdir() if p.suffix in (".sql", ".py") and p.stem[:1].isdigit())
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(255) PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migration(conn, path: Path):
+    if path.suffix == ".sql":
+        conn.exec_driver_sql(path.read_text())
+    else:
+        spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(conn)
+
+
+# Fungsi menjalankan migrasi yang belum diterapkan
+def migrate(engine):
+    applied = applied_versions(engine)
+    for path in list_migrations():
+        if path.stem in applied:
+            continue
+        with engine.begin() as conn:
+            run_migration(conn, path)
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": path.stem})
+        print(f"Applied {path.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+    from database import engine
+    if args.list:
+        applied = applied_versions(engine)
+        for path in list_migrations():
+            print(f"{'applied ' if path.stem in applied else 'pending '} {path.name}")
+        return
+    migrate(engine)
+
+
+if __name__ == "__main__":
+    main()
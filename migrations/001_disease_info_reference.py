@@ -0,0 +1,24 @@
+"""Reference disease text by (category, info_version) instead of copying it into every row.
+
+Run `VACUUM (ANALYZE) user_detection` afterwards so Postgres can reuse the freed space
+(or VACUUM FULL during a maintenance window to shrink the table file).
+"""
+from sqlalchemy import text
+from disease_info import DETAIL_FIELDS, DISEASE_INFO
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE user_detection ADD COLUMN IF NOT EXISTS info_version SMALLINT"))
+    for field in DETAIL_FIELDS:
+        conn.execute(text(f"ALTER TABLE user_detection ALTER COLUMN {field} DROP NOT NULL"))
+
+    # Only rows whose text matches a registry version exactly are normalized;
+    # anything edited by hand keeps its own copy and is returned as-is
+    normalize = text(
+        "UPDATE user_detection "
+        "SET info_version = :version, symptoms = NULL, cause = NULL, treatment = NULL "
+        "WHERE category = :category AND symptoms = :symptoms AND cause = :cause AND treatment = :treatment"
+    )
+    for version, categories in DISEASE_INFO.items():
+        for category, info in categories.items():
+            conn.execute(normalize, {"version": version, "category": category, **{field: info[field] for field in DETAIL_FIELDS}})
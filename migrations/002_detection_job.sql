@@ -0,0 +1,17 @@
+-- Submit-then-poll detection jobs (POST /detection/jobs, GET /detection/jobs/{job_id})
+CREATE TABLE IF NOT EXISTS detection_job (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    plant_id INTEGER REFERENCES plant(id) ON DELETE CASCADE,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    image_key VARCHAR(255) NOT NULL,
+    image_digest VARCHAR(64) NOT NULL,
+    image_url VARCHAR(255) NOT NULL,
+    detection_id INTEGER REFERENCES user_detection(id) ON DELETE SET NULL,
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_detection_job_image_digest ON detection_job (image_digest);
+CREATE INDEX IF NOT EXISTS ix_detection_job_pending ON detection_job (status, updated_at) WHERE status IN ('queued', 'running');
@@ -0,0 +1,43 @@
+-- Per-plant detection summaries, maintained by summaries.record_detections on every insert
+CREATE TABLE IF NOT EXISTS plant_detection_summary (
+    plant_id INTEGER PRIMARY KEY REFERENCES plant(id) ON DELETE CASCADE,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    latest_detection_id INTEGER,
+    latest_category VARCHAR(255),
+    latest_confidence_score DOUBLE PRECISION,
+    latest_detection_date TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_plant_detection_summary_user_id ON plant_detection_summary (user_id);
+
+CREATE TABLE IF NOT EXISTS detection_category_count (
+    plant_id INTEGER REFERENCES plant(id) ON DELETE CASCADE,
+    category VARCHAR(255),
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (plant_id, category)
+);
+CREATE INDEX IF NOT EXISTS ix_detection_category_count_user_id ON detection_category_count (user_id);
+
+-- Backfill from the existing history
+INSERT INTO plant_detection_summary
+    (plant_id, user_id, detection_count, confidence_sum, latest_detection_id, latest_category, latest_confidence_score, latest_detection_date)
+SELECT totals.plant_id, latest.user_id, totals.detection_count, totals.confidence_sum,
+       latest.id, latest.category, latest.confidence_score, latest.detection_date
+FROM (
+    SELECT plant_id, COUNT(*) AS detection_count, COALESCE(SUM(confidence_score), 0) AS confidence_sum, MAX(id) AS latest_id
+    FROM user_detection
+    WHERE plant_id IS NOT NULL
+    GROUP BY plant_id
+) AS totals
+JOIN user_detection AS latest ON latest.id = totals.latest_id
+ON CONFLICT (plant_id) DO NOTHING;
+
+INSERT INTO detection_category_count (plant_id, category, user_id, detection_count, confidence_sum)
+SELECT plant_id, category, MAX(user_id), COUNT(*), COALESCE(SUM(confidence_score), 0)
+FROM user_detection
+WHERE plant_id IS NOT NULL
+GROUP BY plant_id, category
+ON CONFLICT (plant_id, category) DO NOTHING;
@@ -0,0 +1,2 @@
+-- Model version (fingerprint of the model and label encoder files) that produced each detection
+ALTER TABLE user_detection ADD COLUMN IF NOT EXISTS model_version VARCHAR(64);
@@ -0,0 +1,10 @@
+-- Indexes for the filtered and keyset-paginated list endpoints (declared in model.py)
+CREATE INDEX IF NOT EXISTS ix_user_detection_plant_id_detection_date ON user_detection (plant_id, detection_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_user_detection_user_id_detection_date ON user_detection (user_id, detection_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_user_detection_detection_date ON user_detection (detection_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_feedback_user_id ON feedback (user_id);
+CREATE INDEX IF NOT EXISTS ix_feedback_detection_id ON feedback (detection_id);
+CREATE INDEX IF NOT EXISTS ix_plant_user_id ON plant (user_id);
+ANALYZE user_detection;
+ANALYZE feedback;
+ANALYZE plant;
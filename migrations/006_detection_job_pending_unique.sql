@@ -0,0 +1,11 @@
+-- At most one queued/running detection job per (user, plant, upload); duplicates left by
+-- earlier concurrent submissions are failed first, keeping the oldest one
+UPDATE detection_job SET status = 'failed', error = 'Duplicate of an earlier pending job'
+WHERE status IN ('queued', 'running') AND id NOT IN (
+    SELECT DISTINCT ON (user_id, plant_id, image_digest) id
+    FROM detection_job
+    WHERE status IN ('queued', 'running')
+    ORDER BY user_id, plant_id, image_digest, created_at
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_detection_job_pending ON detection_job (user_id, plant_id, image_digest)
+    WHERE status IN ('queued', 'running');
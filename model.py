@@ -1,17 +1,47 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, TIMESTAMP, Text, SmallInteger, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, TIMESTAMP, Text, SmallInteger, Index, func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 Base = declarative_base()
 
+# SQLite stores timestamps as text and compares them as strings. CURRENT_TIMESTAMP writes
+# "YYYY-MM-DD HH:MM:SS" while SQLAlchemy binds "...HH:MM:SS.ffffff", which sorts after the
+# same instant, so keyset cursors and time windows would match the row they started from.
+# Leaving out a zero fraction keeps bound values in the same order as both stored forms.
+class SQLiteTimestamp(sqlite.DATETIME):
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        process = super().bind_processor(dialect)
+
+        def bind(value):
+            if isinstance(value, datetime) and not value.microsecond:
+                return value.strftime("%Y-%m-%d %H:%M:%S")
+            return process(value)
+        return bind
+
+Timestamp = TIMESTAMP().with_variant(SQLiteTimestamp(), "sqlite")
+
 class Token(BaseModel):
     userId: int
     username: str
     access_token: str
     token_type: str
 
+# Item body untuk endpoint bulk (/plant/bulk, /feedback/bulk)
+class PlantCreate(BaseModel):
+    userId: int
+    nama: str = Field(min_length=1, max_length=255)
+
+class FeedbackCreate(BaseModel):
+    user_id: int
+    detection_id: int
+    rating: int
+    comments: str
+
 class User(Base):
     __tablename__ = "users"
 
@@ -37,11 +67,21 @@ class UserDetection(Base):
     plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'))
     image_url = Column(String(255), nullable=False)
     category = Column(String(255), nullable=False)
-    symptoms = Column(Text, nullable=False)
-    cause = Column(Text, nullable=False)
-    treatment = Column(Text, nullable=False)
+    # Reference text is hydrated from disease_info by (category, info_version); these stay NULL for new rows
+    symptoms = Column(Text)
+    cause = Column(Text)
+    treatment = Column(Text)
+    info_version = Column(SmallInteger)
     confidence_score = Column(Float)
-    detection_date = Column(TIMESTAMP, server_default=func.now())
+    model_version = Column(String(64))  # Fingerprint of the model files that produced the prediction
+    detection_date = Column(Timestamp, server_default=func.now())
+
+    # Keyset pages (newest first) of /detection/, /detection/userDetections/{userId} and /detection/history/{plantId}
+    __table_args__ = (
+        Index('ix_user_detection_plant_id_detection_date', plant_id, detection_date.desc(), id.desc()),
+        Index('ix_user_detection_user_id_detection_date', user_id, detection_date.desc(), id.desc()),
+        Index('ix_user_detection_detection_date', detection_date.desc(), id.desc()),
+    )
 
     # Relationships
     user = relationship('User', back_populates='detections')
@@ -53,11 +93,11 @@ class Feedback(Base):
     __tablename__ = 'feedback'
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
-    detection_id = Column(Integer, ForeignKey('user_detection.id', ondelete='CASCADE'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    detection_id = Column(Integer, ForeignKey('user_detection.id', ondelete='CASCADE'), index=True)
     rating = Column(SmallInteger, nullable=False)
     comments = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
 
     # Relationships
     user = relationship('User', back_populates='feedbacks')
@@ -67,10 +107,58 @@ class Plant(Base):
     __tablename__ = 'plant'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
     nama = Column(String(255), nullable=False)
 
 
     # Relationships
     user = relationship('User', back_populates='plant')
-    detection = relationship('UserDetection', back_populates='plant')
\ No newline at end of file
+    detection = relationship('UserDetection', back_populates='plant')
+
+class DetectionJob(Base):
+    __tablename__ = 'detection_job'
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex, returned to the client as job_id
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'))
+    status = Column(String(16), nullable=False, default='queued')  # queued, running, done, failed
+    image_key = Column(String(255), nullable=False)
+    image_digest = Column(String(64), nullable=False, index=True)
+    image_url = Column(String(255), nullable=False)
+    detection_id = Column(Integer, ForeignKey('user_detection.id', ondelete='SET NULL'))
+    attempts = Column(SmallInteger, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # At most one queued/running job per upload, so concurrent retries cannot both insert
+    __table_args__ = (
+        Index(
+            'uq_detection_job_pending', user_id, plant_id, image_digest, unique=True,
+            postgresql_where=status.in_(('queued', 'running')), sqlite_where=status.in_(('queued', 'running')),
+        ),
+    )
+
+
+# Ringkasan deteksi per tanaman, diperbarui dalam transaksi yang sama dengan setiap insert user_detection
+class PlantDetectionSummary(Base):
+    __tablename__ = 'plant_detection_summary'
+
+    plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    detection_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0)
+    latest_detection_id = Column(Integer)
+    latest_category = Column(String(255))
+    latest_confidence_score = Column(Float)
+    latest_detection_date = Column(Timestamp)
+
+
+class DetectionCategoryCount(Base):
+    __tablename__ = 'detection_category_count'
+
+    plant_id = Column(Integer, ForeignKey('plant.id', ondelete='CASCADE'), primary_key=True)
+    category = Column(String(255), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    detection_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from backends import INFERENCE_BACKEND, MODEL_PATHS, load_backend
+from inference import INFERENCE_MAX_BATCH_SIZE
+from prediction_cache import fingerprint_files
+
+LABEL_ENCODER_PATH = os.getenv("LABEL_ENCODER_PATH", 'updated_label_encoder.pkl')
+MODEL_PATH = os.getenv("MODEL_PATH")  # Defaults to the backend's entry in MODEL_PATHS
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "0"))  # Seconds between model file checks; 0 disables the watcher
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """A loaded inference backend together with its label encoder.
+
+    `version` identifies the model files it was loaded from and is recorded on each
+    detection. Requests keep a reference to the LoadedModel they started with, so a
+    reload never changes the model (or labels) under a running prediction.
+    """
+
+    def __init__(self, backend, label_encoder, version: str = "unversioned", spec: tuple = None):
+        self.backend = backend
+        self.label_encoder = label_encoder
+        self.version = version
+        self.spec = spec  # (backend_name, model_path, label_encoder_path, version), None for installed models
+        self.loaded_at = datetime.utcnow()
+
+    def __reduce__(self):
+        # Process-pool inference workers receive the spec and load (once) that version themselves
+        if self.spec is None:
+            raise TypeError("Installed models cannot be sent to an inference process")
+        return _resolve_model, self.spec
+
+
+def load_model(backend_name: str, model_path: str, label_encoder_path: str) -> LoadedModel:
+    """Load and warm up one model version."""
+    import joblib
+    version = fingerprint_files(model_path, label_encoder_path)
+    backend = load_backend(backend_name, model_path)
+    # Warm up for single requests and full batches so real requests skip graph tracing
+    backend.warm_up(batch_sizes=sorted({1, INFERENCE_MAX_BATCH_SIZE}))
+    return LoadedModel(backend, joblib.load(label_encoder_path), version, (backend_name, model_path, label_encoder_path, version))
+
+
+_process_model = None
+
+
+def _resolve_model(backend_name, model_path, label_encoder_path, version):
+    global _process_model
+    if _process_model is None or _process_model.spec != (backend_name, model_path, label_encoder_path, version):
+        _process_model = load_model(backend_name, model_path, label_encoder_path)
+    return _process_model
+
+
+class ModelRegistry:
+    """Owns the model lifecycle: nothing heavy is imported or loaded until it is needed.
+
+    `reload()` loads and warms up the new version next to the current one and then swaps
+    the reference, so requests never wait on a load after the first one.
+    """
+
+    def __init__(self, backend_name: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH, label_encoder_path: str = LABEL_ENCODER_PATH):
+        self.backend_name = backend_name
+        self.model_path = model_path or MODEL_PATHS[backend_name]
+        self.label_encoder_path = label_encoder_path
+        self._current = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reloading = False
+        self.load_error = None
+        self.last_reload_error = None
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    @property
+    def version(self) -> str:
+        """Version of the served model, or of the files it will load from if nothing is loaded yet."""
+        current = self._current
+        if current is not None:
+            return current.version
+        return fingerprint_files(self.model_path, self.label_encoder_path)
+
+    def load(self) -> LoadedModel:
+        """Load and warm up the model once; concurrent callers wait for the same load."""
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    try:
+                        self._current = load_model(self.backend_name, self.model_path, self.label_encoder_path)
+                    except Exception as e:
+                        self.load_error = f"{type(e).__name__}: {e}"
+                        raise
+                    self.load_error = None
+        return self._current
+
+    def reload(self, model_path: str = None, label_encoder_path: str = None, force: bool = False) -> LoadedModel:
+        """Load a new version in the caller's thread, warm it up, then swap it in atomically.
+
+        Without `force`, nothing is loaded when the files still have the served version.
+        A failed load leaves the current model serving. Concurrent reloads run one at a time.
+        """
+        model_path = model_path or self.model_path
+        label_encoder_path = label_encoder_path or self.label_encoder_path
+        with self._reload_lock:
+            current = self._current
+            if not force and current is not None and current.spec is not None and \
+                    current.spec[1:] == (model_path, label_encoder_path, fingerprint_files(model_path, label_encoder_path)):
+                return current
+            self.reloading = True
+            try:
+                model = load_model(self.backend_name, model_path, label_encoder_path)
+            except Exception as e:
+                self.last_reload_error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self.reloading = False
+            with self._lock:
+                self._current = model
+                self.model_path, self.label_encoder_path = model_path, label_encoder_path
+                self.last_reload_error = None
+        return model
+
+    def install(self, model: LoadedModel) -> LoadedModel:
+        """Serve an already loaded model (e.g. a stub in benchmarks) instead of loading from disk."""
+        with self._lock:
+            self._current = model
+        return model
+
+    def get(self) -> LoadedModel:
+        """Return the loaded model, loading it on first use."""
+        return self._current or self.load()
+
+    def status(self) -> dict:
+        current = self._current
+        return {
+            "ready": current is not None,
+            "backend": self.backend_name,
+            "model_path": self.model_path,
+            "version": current.version if current is not None else None,
+            "loaded_at": current.loaded_at.isoformat() if current is not None else None,
+            "load_error": self.load_error,
+            "reloading": self.reloading,
+            "last_reload_error": self.last_reload_error,
+        }
+
+
+# Fungsi memantau file model dan memuat ulang saat berubah
+async def watch_model_files(registry: ModelRegistry, interval: float = MODEL_RELOAD_INTERVAL):
+    """Reload when the model or label encoder files change (e.g. a deploy replaced them).
+
+    Every app worker runs its own watcher, so all of them pick up a new version without a restart.
+    """
+    failed = None
+    while True:
+        await asyncio.sleep(interval)
+        if not registry.ready or registry.reloading:
+            continue
+        fingerprint = await asyncio.to_thread(fingerprint_files, registry.model_path, registry.label_encoder_path)
+        # A broken file is retried only after it changes again
+        if fingerprint in (registry.version, failed):
+            continue
+        try:
+            model = await asyncio.to_thread(registry.reload)
+            logger.info("Model reloaded: version %s", model.version)
+        except Exception:
+            failed = fingerprint
+            logger.exception("Model reload failed")
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Form
-from database import db_dependency
-from model import Plant
+from database import async_db_dependency
+from model import Plant, PlantCreate, User
+from queries import BULK_MAX_ITEMS, fetch_all, insert_many, missing_ids, page_dependency, paginate, project, stream_json
+from sqlalchemy import insert, select
 from sqlalchemy.sql import text
-import pandas as pd
-import sqlalchemy
 
 router = APIRouter(
     prefix="/plant",
@@ -11,67 +11,68 @@ router = APIRouter(
 )
 
 @router.post("/create")
-async def create_plant(db: db_dependency, userId: int = Form(...), nama: str = Form(...)):
-    new_plant = Plant(
-        user_id = userId,
-        nama = nama
-    )
-    db.add(new_plant)
-    db.commit()
-    db.refresh(new_plant)
+async def create_plant(db: async_db_dependency, userId: int = Form(...), nama: str = Form(...)):
+    # INSERT ... RETURNING gives the new id without a separate refresh query
+    result = await db.execute(insert(Plant.__table__).values(user_id=userId, nama=nama).returning(Plant.id, Plant.user_id, Plant.nama))
+    new_plant = dict(result.mappings().one())
+    await db.commit()
     return{
         "status": 200,
         "msg": "Feedback created successfully",
-        "data": {
-            "id": new_plant.id,
-            "user_id": new_plant.user_id,
-            "nama": new_plant.nama
-        }
+        "data": new_plant
+    }
+
+@router.post("/bulk")
+async def create_plants(db: async_db_dependency, plants: list[PlantCreate]):
+    if not plants or len(plants) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BULK_MAX_ITEMS} plants")
+
+    # Validate the whole batch before writing anything
+    unknown_users = await missing_ids(db, User.id, [item.userId for item in plants])
+    if unknown_users:
+        raise HTTPException(status_code=400, detail=f"Unknown userId: {sorted(unknown_users)}")
+
+    data = await insert_many(db, Plant.__table__, [{"user_id": item.userId, "nama": item.nama} for item in plants])
+    await db.commit()
+    return {
+        "status": 200,
+        "msg": "Plants created successfully",
+        "data": data
     }
 
 @router.get("/")
-async def get_plant(db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text('SELECT * FROM public.plant'),
-            conn
-        )
-    if data.empty:
+async def get_plant(db: async_db_dependency, page: page_dependency, stream: bool = False):
+    if stream:
+        query = select(*project(Plant.__table__, page.fields))
+        return stream_json(db, query, msg="Success Get Plant")
+    data, next_cursor = await paginate(db, Plant.__table__, page, order_by=(Plant.id,))
+    if not data and page.cursor is None:
         raise HTTPException(status_code=404, detail="No plants found")
     return {
         "status": 200,
         "msg": "Success Get Plant",
-        "data": data.to_dict('records')
+        "data": data,
+        "next_cursor": next_cursor
     }
 
 @router.get("/user/{userId}")
-async def get_plant_by_user(userId: int, db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text(
-                f'SELECT * FROM public.plant WHERE user_id = {userId}'
-            ), conn
-        )
-    if data.empty:
+async def get_plant_by_user(userId: int, db: async_db_dependency):
+    data = await fetch_all(db, select(Plant.__table__).where(Plant.user_id == userId))
+    if not data:
         raise HTTPException(status_code=404, detail=f"Plant not found")
     return {
         "status": 200,
         "msg": "Success Generate User Plant List",
-        "data": data.to_dict('records')
+        "data": data
     }
 
 @router.get("/list/{userId}")
-async def get_view(userId: int, db: db_dependency):
-    with db.connection() as conn:
-        data = pd.read_sql(
-            sqlalchemy.text(
-                f'SELECT * FROM public.view_list WHERE user_id = {userId}'
-            ), conn
-        )
-    if data.empty:
+async def get_view(userId: int, db: async_db_dependency):
+    data = await fetch_all(db, text('SELECT * FROM public.view_list WHERE user_id = :userId'), {'userId': userId})
+    if not data:
         raise HTTPException(status_code=404, detail=f"Plant not Found")
     return{
         "status": 200,
         "msg": "Success Generate User List Plant",
-        "data": data.to_dict('records')
+        "data": data
     }
\ No newline at end of file
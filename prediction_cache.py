@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# Prediction cache configuration
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR", "")  # Disk tier is disabled when empty
+
+
+# Fungsi membuat fingerprint dari file model
+def fingerprint_files(*paths) -> str:
+    """Fingerprint files by path, size and modification time."""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except FileNotFoundError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """Two-tier (memory LRU + optional disk) cache of predictions keyed by upload hash.
+
+    Entries are scoped to the served model version (`version()`, a fingerprint of the
+    model files), so reloading a retrained model or label encoder invalidates everything.
+    """
+
+    def __init__(self, version, max_entries: int = PREDICTION_CACHE_SIZE, cache_dir: str = PREDICTION_CACHE_DIR):
+        self.version = version
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _check_fingerprint(self):
+        fingerprint = self.version()
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+                # Drop disk entries that belong to older model versions
+                for name in os.listdir(self.cache_dir):
+                    if name != fingerprint:
+                        shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            self._fingerprint = fingerprint
+        return fingerprint
+
+    def _disk_path(self, fingerprint, digest):
+        return os.path.join(self.cache_dir, fingerprint, f"{digest}.json")
+
+    def get(self, digest: str):
+        """Return the cached entry for `digest`, or None on a miss."""
+        with self._lock:
+            fingerprint = self._check_fingerprint()
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+        if entry is None and self.cache_dir:
+            try:
+                with open(self._disk_path(fingerprint, digest)) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._remember(digest, entry)
+        # The stored image may have been cleaned up since it was cached
+        if entry is not None and not os.path.exists(entry["image_path"]):
+            self.discard(digest)
+            return None
+        return entry
+
+    def put(self, digest: str, entry: dict, version: str = None):
+        """Store an entry in memory and, if enabled, on disk.
+
+        An entry computed by `version` is dropped if a reload replaced that version meanwhile.
+        """
+        fingerprint = self._remember(digest, entry, version)
+        if fingerprint is None:
+            return
+        if self.cache_dir:
+            path = self._disk_path(fingerprint, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp{threading.get_ident()}"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+    def discard(self, digest: str):
+        """Remove an entry from both tiers."""
+        with self._lock:
+            self._entries.pop(digest, None)
+            fingerprint = self._fingerprint
+        if self.cache_dir and fingerprint:
+            try:
+                os.remove(self._disk_path(fingerprint, digest))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, digest, entry, version=None):
+        with self._lock:
+            fingerprint = self._check_fingerprint()
+            if version is not None and version != fingerprint:
+                return None
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return fingerprint
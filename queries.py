@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Annotated
+from fastapi import Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, tuple_
+
+# Rows fetched per round-trip when streaming large result sets
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+# Fungsi mengambil semua baris sebagai list of dict
+async def fetch_all(db, statement, params: dict = None) -> list[dict]:
+    """Execute `statement` and return its rows as plain dicts."""
+    result = await db.execute(statement, params or {})
+    return [dict(row) for row in result.mappings()]
+
+
+# Fungsi mengambil satu baris sebagai dict
+async def fetch_one(db, statement, params: dict = None):
+    """Execute `statement` and return the first row as a dict, or None."""
+    row = (await db.execute(statement, params or {})).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def _encode_rows(db, statement, params, msg, status, transform=None):
+    # Use a dedicated server-side cursor: the request's session may be closed before the body is sent
+    async with db.bind.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE), params or {})
+        yield f'{{"status": {status}, "msg": {json.dumps(msg)}, "data": ['
+        separator = ""
+        async for rows in result.mappings().partitions():
+            records = (transform(dict(row)) if transform else dict(row) for row in rows)
+            chunk = ",".join(json.dumps(record, default=_json_default) for record in records)
+            yield separator + chunk
+            separator = ","
+        yield "]}"
+
+
+# Fungsi streaming hasil query besar sebagai JSON
+def stream_json(db, statement, params: dict = None, msg: str = "", status: int = 200, transform=None) -> StreamingResponse:
+    """Stream rows in the usual {status, msg, data} envelope without holding them all in memory.
+
+    `transform`, if given, is applied to each row dict before it is encoded.
+    """
+    return StreamingResponse(_encode_rows(db, statement, params, msg, status, transform), media_type="application/json")
+
+
+class PageParams:
+    """Query parameters shared by paginated list endpoints."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+        fields: str | None = Query(None, description="Comma-separated columns to return, e.g. id,category"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+page_dependency = Annotated[PageParams, Depends()]
+
+
+# Fungsi memilih kolom sesuai parameter fields=
+def project(table, fields: str = None, required=()) -> list:
+    """Return the columns named in `fields` (all columns when empty), plus `required` ones."""
+    if not fields:
+        return list(table.c)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in table.c]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    for column in required:
+        if column.name not in names:
+            names.append(column.name)
+    return [table.c[name] for name in names]
+
+
+def encode_cursor(row: dict, keys) -> str:
+    values = [row[key.name] for key in keys]
+    raw = json.dumps(values, default=_json_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [datetime.fromisoformat(value) if key.type.python_type is datetime else value for key, value in zip(keys, values)]
+    except (ValueError, TypeError, binascii.Error, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Fungsi membuat query satu halaman keyset
+def page_query(table, page: PageParams, *where, order_by, descending: bool = False, required=()):
+    """Return the SELECT for one page (limit + 1 rows, to detect a next page) and its key columns.
+
+    `required` columns are selected even when fields= leaves them out.
+    """
+    keys = [table.c[key.key] for key in order_by]
+    query = select(*project(table, page.fields, required=[*keys, *required])).where(*where)
+    if page.cursor:
+        # A plain tuple binds each value with its key column's type (see model.SQLiteTimestamp)
+        last_seen = tuple(decode_cursor(page.cursor, keys))
+        query = query.where(tuple_(*keys) < last_seen if descending else tuple_(*keys) > last_seen)
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys]).limit(page.limit + 1)
+    return query, keys
+
+
+# Fungsi pagination berbasis keyset
+async def paginate(db, table, page: PageParams, *where, order_by, descending: bool = False, required=()):
+    """Fetch one page ordered by the `order_by` key columns and return (rows, next_cursor).
+
+    Pages continue from the last key seen instead of using OFFSET, so each page costs the
+    same index range scan however deep the client scrolls.
+    """
+    query, keys = page_query(table, page, *where, order_by=order_by, descending=descending, required=required)
+    rows = await fetch_all(db, query)
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(rows[-1], keys)
+    return rows, next_cursor
+
+
+# Fungsi insert dengan dukungan ON CONFLICT sesuai dialect
+def dialect_insert(db, table):
+    """Return the dialect's INSERT construct (which has on_conflict_do_update/do_nothing) for `table`."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT inserts are not implemented for {dialect}")
+    return insert(table)
+
+
+# Maximum items accepted by one bulk write
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+
+
+# Fungsi memeriksa id yang dirujuk oleh item bulk
+async def missing_ids(db, column, ids) -> set:
+    """Return the ids in `ids` that have no row in `column`'s table (one query for the whole batch)."""
+    wanted = set(ids)
+    if not wanted:
+        return set()
+    result = await db.execute(select(column).where(column.in_(wanted)))
+    return wanted - set(result.scalars())
+
+
+# Fungsi insert banyak baris dalam satu statement
+async def insert_many(db, table, rows: list[dict]) -> list[dict]:
+    """Insert `rows` and return the stored rows in input order.
+
+    SQLAlchemy renders this as a multi-row INSERT ... RETURNING (up to 1000 rows per
+    statement), not one round-trip per row.
+    """
+    result = await db.execute(insert(table).returning(*table.c, sort_by_parameter_order=True), rows)
+    return [dict(row) for row in result.mappings()]
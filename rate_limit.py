@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Login rate limits (attempts per window, per worker process)
+LOGIN_ATTEMPTS_PER_ACCOUNT = int(os.getenv("LOGIN_ATTEMPTS_PER_ACCOUNT", "5"))
+# Failed attempts per client IP. Behind a reverse proxy the client IP comes from X-Forwarded-For
+# only when the proxy is trusted: uvicorn's --forwarded-allow-ips / FORWARDED_ALLOW_IPS (127.0.0.1 by default)
+LOGIN_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_ATTEMPTS_PER_IP", "20"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "60"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class SlidingWindowLimiter:
+    """Allow at most `max_attempts` per `window_seconds` for each key.
+
+    Keys are kept in LRU order and capped at `max_keys`, so a flood of distinct
+    keys cannot grow memory without bound.
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> float:
+        """Record an attempt for `key`; return 0 if allowed, else seconds until the next slot frees up."""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            self._attempts.move_to_end(key)
+            while attempts and attempts[0] <= now - self.window_seconds:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                return attempts[0] + self.window_seconds - now
+            attempts.append(now)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+            return 0.0
+
+    def reset(self, key: str):
+        """Forget the attempts recorded for `key`."""
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def release(self, key: str):
+        """Take back the latest attempt recorded for `key` (e.g. a login that succeeded)."""
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts:
+                attempts.pop()
+
+
+account_limiter = SlidingWindowLimiter(LOGIN_ATTEMPTS_PER_ACCOUNT, LOGIN_WINDOW_SECONDS)
+ip_limiter = SlidingWindowLimiter(LOGIN_ATTEMPTS_PER_IP, LOGIN_WINDOW_SECONDS)
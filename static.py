@@ -0,0 +1,46 @@
+import os
+import re
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+# Cache policy for served uploads
+IMMUTABLE_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", str(365 * 24 * 3600)))
+MUTABLE_CACHE_CONTROL = "no-cache"  # Anything else must be revalidated (cheap 304 via the ETag)
+
+# <sha256>.<ext> from storage.py, its variants, and the legacy imagesDetection{Id}{uuid8}.<ext> names.
+# None of these are ever rewritten in place, so clients may cache them forever.
+CONTENT_ADDRESSED = re.compile(r"(?P<digest>[0-9a-f]{64})(_[a-z]+)?\.\w+")
+UUID_NAMED = re.compile(r"images(Detection|User)\d+[0-9a-f]{8}(_[a-z]+)?\.\w+")
+
+
+# Fungsi menentukan header cache untuk file upload
+def cache_headers(path) -> dict:
+    """Return Cache-Control (and, for content-addressed originals, a content-hash ETag) for `path`."""
+    filename = os.path.basename(path)
+    match = CONTENT_ADDRESSED.fullmatch(filename)
+    if match is None and UUID_NAMED.fullmatch(filename) is None:
+        return {"cache-control": MUTABLE_CACHE_CONTROL}
+    headers = {"cache-control": f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"}
+    if match is not None and match.group(2) is None:
+        # The file name is the SHA-256 of its bytes: a strong validator that is identical on every server
+        headers["etag"] = f'"{match.group("digest")}"'
+    return headers
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for immutable uploads.
+
+    Starlette already answers If-None-Match / If-Modified-Since with 304, serves
+    Range requests with 206, and hands the file to the server via the pathsend
+    extension when the server supports it; this only sets the cache policy.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers.update(cache_headers(full_path))
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
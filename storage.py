@@ -0,0 +1,121 @@
+import os
+import uuid
+from pathlib import Path
+from fastapi import UploadFile
+from PIL import Image, UnidentifiedImageError
+from ingest import stream_upload
+
+# Storage configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local" or "s3"
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", "uploads")  # Also the local working copy for the s3 backend
+STORAGE_URL_PREFIX = "uploads"  # Where main.py mounts STORAGE_ROOT
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://localhost:9000 for MinIO
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "")  # Serve from the bucket instead of this API when set
+
+# Stored extension is taken from the decoded format, never from the client's filename
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif", "BMP": "bmp", "TIFF": "tif", "MPO": "jpg"}
+
+
+class StoredFile:
+    """Result of a save: the storage key, a local path to read it from and its content hash."""
+
+    def __init__(self, key: str, path: str, digest: str, created: bool):
+        self.key = key
+        self.path = path
+        self.digest = digest
+        self.created = created
+
+
+class Storage:
+    """Interface for upload storage. Keys look like `detections/ab/cd/<sha256>.jpg`."""
+
+    def save(self, file: UploadFile, namespace: str) -> StoredFile:
+        raise NotImplementedError
+
+    def path(self, key: str) -> str:
+        """Local path of the object, for decoding and variant generation."""
+        raise NotImplementedError
+
+    def url(self, key: str, base_url: str) -> str:
+        raise NotImplementedError
+
+    def publish(self, path) -> None:
+        """Make a file derived locally from a stored object (e.g. a thumbnail) available to clients."""
+
+
+class LocalStorage(Storage):
+    """Content-addressed files under `root`, sharded two levels deep by hash prefix."""
+
+    def __init__(self, root: str = STORAGE_ROOT, url_prefix: str = STORAGE_URL_PREFIX):
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+
+    @staticmethod
+    def make_key(namespace: str, digest: str, extension: str) -> str:
+        return f"{namespace}/{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+    def save(self, file: UploadFile, namespace: str) -> StoredFile:
+        staging = self.root / namespace / ".incoming"
+        staging.mkdir(parents=True, exist_ok=True)
+        tmp_path = staging / f"{uuid.uuid4().hex}.tmp"
+        try:
+            digest = stream_upload(file, tmp_path)
+            try:
+                with Image.open(tmp_path) as image:
+                    image_format = image.format
+            except UnidentifiedImageError:
+                raise ValueError("Invalid image file")
+            key = self.make_key(namespace, digest, IMAGE_EXTENSIONS.get(image_format, image_format.lower()))
+            final_path = self.root / key
+            created = not final_path.exists()
+            if created:
+                final_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, final_path)  # Atomic: readers never see a partial file
+            return StoredFile(key, str(final_path), digest, created)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()  # Duplicate upload or failed write
+
+    def path(self, key: str) -> str:
+        return str(self.root / key)
+
+    def url(self, key: str, base_url: str) -> str:
+        return f"{base_url}{self.url_prefix}/{key}"
+
+
+class S3Storage(LocalStorage):
+    """S3-compatible bucket (AWS, MinIO, ...) with a local working copy for preprocessing."""
+
+    def __init__(self, bucket: str = S3_BUCKET, endpoint_url: str = S3_ENDPOINT_URL, public_url: str = S3_PUBLIC_URL, root: str = STORAGE_ROOT):
+        super().__init__(root)
+        import boto3
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def save(self, file: UploadFile, namespace: str) -> StoredFile:
+        stored = super().save(file, namespace)
+        if stored.created:
+            self.client.upload_file(stored.path, self.bucket, stored.key)
+        return stored
+
+    def publish(self, path) -> None:
+        key = Path(path).relative_to(self.root).as_posix()
+        self.client.upload_file(str(path), self.bucket, key)
+
+    def url(self, key: str, base_url: str) -> str:
+        return f"{self.public_url}/{key}" if self.public_url else super().url(key, base_url)
+
+
+STORAGE_BACKENDS = {"local": LocalStorage, "s3": S3Storage}
+
+
+# Fungsi membuat backend storage sesuai konfigurasi
+def get_storage(name: str = STORAGE_BACKEND) -> Storage:
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of {sorted(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[name]()
+
+
+storage = get_storage()
@@ -0,0 +1,109 @@
+from sqlalchemy import case, func, select
+from model import DetectionCategoryCount, PlantDetectionSummary, UserDetection as Detection
+from queries import dialect_insert, fetch_all, fetch_one
+
+# Columns a caller must pass for each inserted detection
+SUMMARY_COLUMNS = (Detection.id, Detection.user_id, Detection.plant_id, Detection.category, Detection.confidence_score, Detection.detection_date)
+
+
+# Fungsi memperbarui ringkasan setelah insert user_detection
+async def record_detections(db, rows: list[dict]):
+    """Fold newly inserted detection rows into the summary tables.
+
+    Runs inside the caller's transaction, so the detections and their summaries commit
+    (or roll back) together. Rows are pre-aggregated per plant so a batch insert costs
+    one upsert per plant and per category; keys are upserted in sorted order so
+    concurrent writers lock summary rows in the same order.
+    """
+    plants, categories = {}, {}
+    for row in rows:
+        if row["plant_id"] is None:
+            continue
+        confidence = row["confidence_score"] or 0.0
+        plant = plants.setdefault(row["plant_id"], {
+            "plant_id": row["plant_id"], "user_id": row["user_id"], "detection_count": 0, "confidence_sum": 0.0, "latest_detection_id": 0,
+        })
+        plant["detection_count"] += 1
+        plant["confidence_sum"] += confidence
+        if row["id"] > plant["latest_detection_id"]:
+            plant.update(
+                latest_detection_id=row["id"],
+                latest_category=row["category"],
+                latest_confidence_score=row["confidence_score"],
+                latest_detection_date=row["detection_date"],
+            )
+        category = categories.setdefault((row["plant_id"], row["category"]), {
+            "plant_id": row["plant_id"], "category": row["category"], "user_id": row["user_id"], "detection_count": 0, "confidence_sum": 0.0,
+        })
+        category["detection_count"] += 1
+        category["confidence_sum"] += confidence
+
+    summary = PlantDetectionSummary.__table__
+    for key in sorted(plants):
+        statement = dialect_insert(db, summary).values(**plants[key])
+        newer = statement.excluded.latest_detection_id > func.coalesce(summary.c.latest_detection_id, 0)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[summary.c.plant_id],
+            set_={
+                "detection_count": summary.c.detection_count + statement.excluded.detection_count,
+                "confidence_sum": summary.c.confidence_sum + statement.excluded.confidence_sum,
+                **{
+                    name: case((newer, statement.excluded[name]), else_=summary.c[name])
+                    for name in ("latest_detection_id", "latest_category", "latest_confidence_score", "latest_detection_date")
+                },
+            },
+        ))
+
+    counts = DetectionCategoryCount.__table__
+    for key in sorted(categories):
+        statement = dialect_insert(db, counts).values(**categories[key])
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[counts.c.plant_id, counts.c.category],
+            set_={
+                "detection_count": counts.c.detection_count + statement.excluded.detection_count,
+                "confidence_sum": counts.c.confidence_sum + statement.excluded.confidence_sum,
+            },
+        ))
+
+
+def _with_average(row: dict) -> dict:
+    confidence_sum = row.pop("confidence_sum")
+    row["average_confidence"] = confidence_sum / row["detection_count"] if row["detection_count"] else None
+    return row
+
+
+# Fungsi mengambil ringkasan satu tanaman
+async def get_plant_summary(db, plant_id: int):
+    summary = await fetch_one(db, select(PlantDetectionSummary.__table__).where(PlantDetectionSummary.plant_id == plant_id))
+    if summary is None:
+        return None
+    categories = await fetch_all(db, select(
+        DetectionCategoryCount.category, DetectionCategoryCount.detection_count, DetectionCategoryCount.confidence_sum
+    ).where(DetectionCategoryCount.plant_id == plant_id).order_by(DetectionCategoryCount.category))
+    summary = _with_average(summary)
+    summary["categories"] = [_with_average(row) for row in categories]
+    return summary
+
+
+# Fungsi mengambil ringkasan semua tanaman milik user
+async def get_user_summary(db, user_id: int):
+    plants = await fetch_all(db, select(PlantDetectionSummary.__table__)
+                             .where(PlantDetectionSummary.user_id == user_id)
+                             .order_by(PlantDetectionSummary.latest_detection_id.desc()))
+    if not plants:
+        return None
+    categories = await fetch_all(db, select(
+        DetectionCategoryCount.category,
+        func.sum(DetectionCategoryCount.detection_count).label("detection_count"),
+        func.sum(DetectionCategoryCount.confidence_sum).label("confidence_sum"),
+    ).where(DetectionCategoryCount.user_id == user_id).group_by(DetectionCategoryCount.category).order_by(DetectionCategoryCount.category))
+    detection_count = sum(plant["detection_count"] for plant in plants)
+    confidence_sum = sum(plant["confidence_sum"] for plant in plants)
+    return {
+        "user_id": user_id,
+        "plant_count": len(plants),
+        "detection_count": detection_count,
+        "average_confidence": confidence_sum / detection_count if detection_count else None,
+        "categories": [_with_average(row) for row in categories],
+        "plants": [_with_average(plant) for plant in plants],
+    }
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import uuid
+import pytest
+
+# The app modules live at the repository root and read their configuration at import time,
+# so point them at throwaway SQLite/upload locations before any test imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="plantix-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIRECTORY, 'app.db')}"
+os.environ["STORAGE_ROOT"] = os.path.join(TEST_DIRECTORY, "uploads")
+os.environ["MODEL_PRELOAD"] = "lazy"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["BCRYPT_ROUNDS"] = "4"  # bcrypt minimum, keeps login-heavy tests fast
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The whole app on the test database, serving predictions from the benchmark stub model."""
+    from fastapi.testclient import TestClient
+    from benchmark import StubBackend, stub_label_encoder
+    from database import engine
+    from model import Base
+    from model_registry import LoadedModel
+    import main
+
+    Base.metadata.create_all(engine)
+    main.detection.model_registry.install(LoadedModel(StubBackend(), stub_label_encoder()))
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def account(client):
+    """Register a fresh user and return (user_id, email, password)."""
+    email, password = f"user-{uuid.uuid4().hex[:12]}@plantix.id", "test-password"
+    client.post("/auth/register", data={"username": email.split("@")[0], "email": email, "password": password})
+    login = client.post("/auth/login", data={"username": email, "password": password})
+    return login.json()["userId"], email, password
@@ -0,0 +1,36 @@
+import uuid
+import auth
+from database import async_engine
+from rate_limit import LOGIN_ATTEMPTS_PER_IP, ip_limiter
+
+
+def test_login_releases_its_connection_before_verifying_the_password(client, account, monkeypatch):
+    _, email, password = account
+    checked_out = []
+    verify_password = auth.verify_password
+
+    async def recording_verify(*args):
+        checked_out.append(async_engine.sync_engine.pool.checkedout())
+        return await verify_password(*args)
+
+    monkeypatch.setattr(auth, "verify_password", recording_verify)
+    response = client.post("/auth/login", data={"username": email, "password": password})
+    assert response.status_code == 200
+    assert checked_out == [0]
+
+
+def test_successful_logins_do_not_count_against_a_shared_ip(client, account):
+    _, email, password = account
+    for _ in range(LOGIN_ATTEMPTS_PER_IP + 5):
+        assert client.post("/auth/login", data={"username": email, "password": password}).status_code == 200
+
+
+def test_failed_logins_are_limited_per_ip(client):
+    try:
+        statuses = [
+            client.post("/auth/login", data={"username": f"{uuid.uuid4().hex}@plantix.id", "password": "wrong"}).status_code
+            for _ in range(LOGIN_ATTEMPTS_PER_IP + 1)
+        ]
+        assert statuses == [401] * LOGIN_ATTEMPTS_PER_IP + [429]
+    finally:
+        ip_limiter.reset("ip:testclient")
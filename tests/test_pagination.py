@@ -0,0 +1,22 @@
+from benchmark import stub_photo
+
+
+def test_history_pages_through_api_detections_without_repeats(client, account):
+    user_id, _, _ = account
+    plant_id = client.post("/plant/create", data={"userId": user_id, "nama": "tomat"}).json()["data"]["id"]
+    created = []
+    for i in range(4):
+        response = client.post("/detection/predict", data={"userId": user_id, "plantId": plant_id},
+                               files={"image": (f"leaf{i}.jpg", stub_photo(1000 + i), "image/jpeg")})
+        assert response.status_code == 200, response.text
+        created.append(response.json()["data"]["detection"]["id"])
+
+    seen, cursor = [], None
+    for _ in range(len(created) + 1):
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/detection/history/{plant_id}", params=params).json()
+        seen += [row["id"] for row in page["data"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(created, reverse=True)
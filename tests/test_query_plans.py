@@ -0,0 +1,27 @@
+import pytest
+from benchmark import audit_query_plans, seed_database
+
+# Same shape as `python benchmark.py explain`: 100 users, 1000 plants, 20k detections, 5k feedback
+SEEDED_ROWS = 20000
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(tmp_path_factory):
+    engine = seed_database(SEEDED_ROWS, tmp_path_factory.mktemp("plans") / "seeded.db")
+    yield engine
+    engine.dispose()
+
+
+def test_list_queries_use_index_scans(seeded_engine):
+    report = audit_query_plans(seeded_engine)
+    assert report["failures"] == [], {label: report["queries"][label]["plan"] for label in report["failures"]}
+
+
+def test_audit_covers_cursor_pages_on_empty_tables(tmp_path):
+    engine = seed_database(0, tmp_path / "empty.db")
+    try:
+        report = audit_query_plans(engine)
+    finally:
+        engine.dispose()
+    assert "/detection/history/{plantId} (cursor page)" in report["queries"]
+    assert report["failures"] == [], {label: report["queries"][label]["plan"] for label in report["failures"]}
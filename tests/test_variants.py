@@ -0,0 +1,29 @@
+import threading
+import thumbnails
+from benchmark import stub_photo
+
+
+def test_predict_responds_before_preview_variants_are_written(client, account, monkeypatch):
+    user_id, _, _ = account
+    plant_id = client.post("/plant/create", data={"userId": user_id, "nama": "cabai"}).json()["data"]["id"]
+    release = threading.Event()
+    generate_variants = thumbnails.generate_variants
+
+    def blocked_generate_variants(*args, **kwargs):
+        # Only returns once the predict response is back, so awaiting it on the request path fails
+        if not release.wait(timeout=5):
+            raise TimeoutError("preview variants were generated on the request path")
+        return generate_variants(*args, **kwargs)
+
+    monkeypatch.setattr(thumbnails, "generate_variants", blocked_generate_variants)
+    try:
+        response = client.post("/detection/predict", data={"userId": user_id, "plantId": plant_id},
+                               files={"image": ("leaf.jpg", stub_photo(2000), "image/jpeg")})
+        assert response.status_code == 200, response.text
+    finally:
+        release.set()
+    variants = response.json()["data"]["image_variants"]
+    for url in variants.values():
+        preview = client.get(url)
+        assert preview.status_code == 200
+        assert preview.headers["content-type"] == "image/webp"
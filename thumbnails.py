@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from PIL import Image, ImageOps
+from executor import run_variants
+from metrics import stage
+
+# Derived image configuration (longest side in pixels)
+VARIANT_SIZES = {
+    "thumb": int(os.getenv("THUMBNAIL_SIZE", "200")),
+    "medium": int(os.getenv("MEDIUM_IMAGE_SIZE", "800")),
+}
+VARIANT_FORMAT = os.getenv("VARIANT_FORMAT", "webp").lower()  # "webp" or "jpeg"
+VARIANT_QUALITY = int(os.getenv("VARIANT_QUALITY", "80"))
+VARIANT_DIRECTORY = "variants"
+
+logger = logging.getLogger(__name__)
+
+
+# Fungsi membuat path varian gambar
+def variant_path(image_path, name: str) -> Path:
+    """Return where the `name` variant of an uploaded image is stored."""
+    image_path = Path(image_path)
+    extension = "jpg" if VARIANT_FORMAT == "jpeg" else VARIANT_FORMAT
+    return image_path.parent / VARIANT_DIRECTORY / f"{image_path.stem}_{name}.{extension}"
+
+
+# Fungsi membuat thumbnail dan gambar ukuran sedang
+def generate_variants(image_path, publish=None) -> dict:
+    """Create every missing variant of `image_path` and return {name: path}.
+
+    `publish`, if given, is called with the path of each newly written variant.
+    """
+    paths = {name: variant_path(image_path, name) for name in VARIANT_SIZES}
+    missing = [name for name, path in paths.items() if not path.exists()]
+    if missing:
+        with stage("variants"):
+            largest = max(VARIANT_SIZES[name] for name in missing)
+            with Image.open(image_path) as image:
+                image.draft("RGB", (largest, largest))
+                image = ImageOps.exif_transpose(image)  # Phone photos carry rotation in EXIF
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
+                # Largest first, so each smaller variant is resized from the previous one
+                for name in sorted(missing, key=VARIANT_SIZES.get, reverse=True):
+                    size = VARIANT_SIZES[name]
+                    image.thumbnail((size, size), reducing_gap=3.0)
+                    path = paths[name]
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    # Unique per writer: the background task and the lazy route may encode the same variant
+                    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+                    image.save(tmp_path, format=VARIANT_FORMAT.upper(), quality=VARIANT_QUALITY)
+                    os.replace(tmp_path, path)
+                    if publish is not None:
+                        publish(path)
+    return {name: str(path) for name, path in paths.items()}
+
+
+_scheduled = set()  # Running variant tasks (the event loop only keeps weak references)
+
+
+def _variants_done(task: asyncio.Task):
+    _scheduled.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Variant generation failed", exc_info=task.exception())
+
+
+# Fungsi menjadwalkan pembuatan varian tanpa menahan response
+def schedule_variants(image_path, publish=None) -> asyncio.Task:
+    """Generate the variants of `image_path` in the background on the variant pool.
+
+    Until they are written, GET /uploads/.../variants/<name> creates them on first request.
+    """
+    task = asyncio.get_running_loop().create_task(run_variants(generate_variants, image_path, publish=publish))
+    _scheduled.add(task)
+    task.add_done_callback(_variants_done)
+    return task
+
+
+# Fungsi membuat URL varian dari URL gambar asli
+def variant_urls(image_url: str) -> dict:
+    """Derive variant URLs from a stored image URL (no file system access)."""
+    if not image_url:
+        return None
+    base, _, filename = image_url.rpartition("/")
+    return {name: f"{base}/{VARIANT_DIRECTORY}/{variant_path(filename, name).name}" for name in VARIANT_SIZES}
+
+
+# Fungsi mencari gambar asli untuk varian yang diminta
+def find_original(directory, variant_filename: str):
+    """Map `<stem>_<name>.<ext>` back to the original upload in `directory`, or None."""
+    stem, _, rest = variant_filename.rpartition("_")
+    name = rest.split(".", 1)[0]
+    if name not in VARIANT_SIZES or not re.fullmatch(r"[\w.-]+", stem):
+        return None
+    for candidate in Path(directory).glob(f"{stem}.*"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+# Fungsi menambahkan URL varian ke baris hasil query
+def with_variant_urls(row: dict, url_field: str, variants_field: str) -> dict:
+    """Add `variants_field` next to `url_field` when the row includes that column."""
+    if url_field in row:
+        row[variants_field] = variant_urls(row[url_field])
+    return row
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+from PIL import Image
+from ingest import preprocess_image
+from metrics import stage
+
+# Test-time augmentation configuration
+TTA_MODE = os.getenv("TTA_MODE", "off")  # "off", or "auto" (only below the confidence threshold)
+TTA_CONFIDENCE_THRESHOLD = float(os.getenv("TTA_CONFIDENCE_THRESHOLD", "0.6"))
+TTA_VIEWS = tuple(view.strip() for view in os.getenv("TTA_VIEWS", "hflip,vflip,center,top_left,top_right,bottom_left,bottom_right").split(",") if view.strip())
+TTA_CROP_SCALE = float(os.getenv("TTA_CROP_SCALE", "1.15"))  # Crops come from a decode this much larger than the model input
+
+FLIPS = ("hflip", "vflip")
+CROPS = ("center", "top_left", "top_right", "bottom_left", "bottom_right")
+
+
+# Fungsi menentukan apakah prediksi perlu diulang dengan augmentasi
+def needs_tta(confidence_score: float, enabled: bool, threshold: float = TTA_CONFIDENCE_THRESHOLD) -> bool:
+    return enabled and confidence_score < threshold
+
+
+# Fungsi membuat tampilan augmentasi dari gambar yang sama
+def tta_views(path, tensor: np.ndarray, target_size, views=TTA_VIEWS, crop_scale: float = TTA_CROP_SCALE) -> list[np.ndarray]:
+    """Return the augmented (1, H, W, 3) views of an image whose first-pass tensor is `tensor`.
+
+    Flips reuse `tensor`; crops decode the file again slightly larger than `target_size`
+    and cut `target_size` windows out of it.
+    """
+    unknown = [view for view in views if view not in FLIPS + CROPS]
+    if unknown:
+        raise ValueError(f"Unknown TTA views: {unknown}")
+    result = []
+    for view in views:
+        if view == "hflip":
+            result.append(np.ascontiguousarray(tensor[:, :, ::-1]))
+        elif view == "vflip":
+            result.append(np.ascontiguousarray(tensor[:, ::-1]))
+    crops = [view for view in views if view in CROPS]
+    if crops:
+        width, height = target_size
+        large_size = (round(width * crop_scale), round(height * crop_scale))
+        with Image.open(path) as image:
+            with stage("decode"):
+                image.draft("RGB", large_size)
+                image.load()
+            with stage("preprocess"):
+                large = preprocess_image(image, large_size)
+        dy, dx = large_size[1] - height, large_size[0] - width
+        offsets = {
+            "center": (dy // 2, dx // 2),
+            "top_left": (0, 0),
+            "top_right": (0, dx),
+            "bottom_left": (dy, 0),
+            "bottom_right": (dy, dx),
+        }
+        for view in crops:
+            y, x = offsets[view]
+            result.append(np.ascontiguousarray(large[:, y:y + height, x:x + width]))
+    return result
+
+
+# Fungsi merata-ratakan probabilitas dari semua tampilan
+def average_predictions(probabilities: list) -> np.ndarray:
+    return np.mean(np.stack(probabilities), axis=0)
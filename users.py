@@ -1,101 +1,89 @@
 from fastapi import APIRouter, HTTPException, Form, UploadFile, File, Request
-from database import db_dependency
-import uuid
-import pandas as pd
-import sqlalchemy
-from pathlib import Path
-import os
+from auth import invalidate_user, user_context_dependency
+from database import async_db_dependency
+from model import User
+from queries import fetch_all, fetch_one
+from storage import StoredFile, storage
+from executor import run_preprocess
+from thumbnails import schedule_variants, variant_urls, with_variant_urls
+from sqlalchemy import select, update
 
 router = APIRouter(
     prefix='/users',
     tags=['users']
 )
 
-UPLOAD_DIRECTORY = "uploads/users"
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)  # Create the directory if it doesn't exist
+UPLOAD_NAMESPACE = "users"
 
-# Fungsi membuat Filename baru
-def generate_new_filename(file, Id):
-    """Generate a new filename based on a specific format."""
-    file_extension = file.filename.split(".")[-1]  # Get the file extension
-    new_filename = f"imagesUser{Id}{str(uuid.uuid4())[:8]}.{file_extension}"  # Create a new filename using UUID
-    return new_filename
+# Fungsi menyimpan file ke storage
+def save_file_locally(file: UploadFile) -> StoredFile:
+    """Store the upload under its content hash; identical uploads share one stored file."""
+    return storage.save(file, UPLOAD_NAMESPACE)
 
-# Fungsi menyimpan file secara lokal
-def save_file_locally(file: UploadFile, filename: str) -> str:
-    """Save uploaded file locally and return its path."""
-    file_path = Path(UPLOAD_DIRECTORY) / filename
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-    return str(file_path)
+@router.get("/me")
+async def get_current_user_detail(user: user_context_dependency):
+    return {
+        "status": 200,
+        "msg": "Success Get Current User",
+        "data": with_variant_urls(dict(user), "profile_picture_url", "profile_picture_variants")
+    }
 
 @router.get("/detail")
-async def get_users_detail(userId: int, db: db_dependency):
-    with db.connection() as conn:
-        query = sqlalchemy.text(
-            'SELECT * FROM public.users WHERE id = :userId'
-        )
-        data = pd.read_sql(query, conn, params={'userId': userId})
-
-    if data.empty:
+async def get_users_detail(userId: int, db: async_db_dependency):
+    data = [with_variant_urls(row, "profile_picture_url", "profile_picture_variants") for row in await fetch_all(db, select(User.__table__).where(User.id == userId))]
+
+    if not data:
         raise HTTPException(status_code=404, detail=f"User with userId {userId} not found")
 
     return {
         "status": 200,
         "msg": "Success Get User Details",
-        "data": data.to_dict('records')
+        "data": data
     }
 
 @router.put("/update{userId}")
-async def update_user(db: db_dependency, userId: int, full_name: str = Form(...), profile_picture: UploadFile = File(...), request: Request):
+async def update_user(db: async_db_dependency, userId: int, request: Request, full_name: str = Form(...), profile_picture: UploadFile = File(...)):
     if profile_picture.content_type.split("/")[0] != "image":
         raise HTTPException(status_code=400, detail="Invalid image file")
 
-    new_filename = generate_new_filename(profile_picture, userId)
-    picture_path = save_file_locally(profile_picture, new_filename)
-
-    # Bangun URL lengkap untuk gambar profil
-    base_url = str(request.base_url)  # Ambil URL dasar (misalnya: http://127.0.0.1:8000/)
-    full_picture_url = f"{base_url}{picture_path}"  # Gabungkan URL dasar dengan path gambar
-
-    with db.connection() as conn:
-        # Check if the user exists
-        existing_user_query = sqlalchemy.text(
-            'SELECT * FROM public.users WHERE id = :userId'
-        )
-        existing_user = pd.read_sql(existing_user_query, conn, params={'userId': userId})
-
-        if existing_user.empty:
-            raise HTTPException(status_code=404, detail=f"User with userId {userId} not found")
-        
-        # Update user details
-        update_query = sqlalchemy.text(
-            'UPDATE public.users SET '
-            '"full_name" = :full_name, '
-            '"profile_picture_url" = :profile_picture_url '
-            'WHERE id = :userId'
-        )
-        try:
-            conn.execute(
-                update_query,{
-                    "full_name": full_name,
-                    "profile_picture_url": full_picture_url,
-                    "userId": userId
-                    })
-            conn.commit()
-        except Exception as e:
-            conn.rollback()  # Rollback transaksi jika terjadi kesalahan
-            print("Error during update:", e)
-
-        # Get updated user details
-        updated_user_query = sqlalchemy.text(
-            'SELECT * FROM public.users WHERE id = :userId'
-        )
-        updated_user = pd.read_sql(updated_user_query, conn, params={'userId': userId})
+    try:
+        stored = await run_preprocess(save_file_locally, profile_picture)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Thumbnail and medium previews for list and profile screens, written in the background
+    schedule_variants(stored.path, publish=storage.publish)
+
+    # Bangun URL lengkap untuk gambar profil dari key storage
+    full_picture_url = storage.url(stored.key, str(request.base_url))  # misalnya: http://127.0.0.1:8000/uploads/users/ab/cd/<hash>.jpg
+
+    # Check if the user exists
+    existing_user = await fetch_one(db, select(User.id).where(User.id == userId))
+
+    if existing_user is None:
+        raise HTTPException(status_code=404, detail=f"User with userId {userId} not found")
+
+    # Update user details
+    update_query = (
+        update(User.__table__)
+        .where(User.id == userId)
+        .values(full_name=full_name, profile_picture_url=full_picture_url)
+    )
+    try:
+        await db.execute(update_query)
+        await db.commit()
+        invalidate_user(userId)
+    except Exception as e:
+        await db.rollback()  # Rollback transaksi jika terjadi kesalahan
+        print("Error during update:", e)
+
+    # Get updated user details
+    updated_user = [with_variant_urls(row, "profile_picture_url", "profile_picture_variants") for row in await fetch_all(db, select(User.__table__).where(User.id == userId))]
 
     return {
         "status": 200,
         "msg": f"User details updated successfully for userId {userId}",
-        "data": updated_user.to_dict('records'),
-        "picture_url": full_picture_url
+        "data": updated_user,
+        "picture_url": full_picture_url,
+        "picture_variants": variant_urls(full_picture_url)
     }